@@ -2,5 +2,8 @@ from . import lib
 from . import config
 
 from .albums import MooAlbums
+from .covers import MooCovers
 from .playlists import MooPlaylists
 from .search import MooSearch
+from .track import MooTrack
+from .watch import MooWatcher
@@ -4,15 +4,24 @@ MooAlbums class
 
 import logging
 import os
+import threading
 import time
 
 from collections import Counter, OrderedDict
+from itertools import repeat
 from pathlib import Path
 from urllib.parse import quote
 
 import mutagen
 
+from . import lib, reader
+from .cache import MooCache
+from .catalog import MooCatalog, current
+from .extract import extract
+from .facets import FACETS, MooFacets
+from .orders import SORT_KEYS, MooOrders
 from .tags import mp3_fields, mp4_fields
+from .track import MooTrack
 
 
 class MooAlbums:
@@ -23,16 +32,38 @@ class MooAlbums:
 
     index = list()
     albums = dict()
+    catalog = None
+    covers = dict()
+    dirs = dict()
+    facets = None
+    files = dict()
+    modified = 0  # time (ns) albums last changed
+    orders = None
 
     def __init__(self, config):
         logging.basicConfig(level=logging.INFO)
 
         self.base = config.get('BASE')
+        self.cache = MooCache(config.get('METADATA_CACHE', 256))
+        self.lock = threading.Lock()
+        self.workers = config.get('WORKERS')
+
+        if config.get('CATALOG'):
+            self.catalog = MooCatalog(config['CATALOG'])
 
         if self.base and os.path.exists(self.base):
-            self.index = self.albums_index()
-            self.albums = self.albums_data()
-            self.alpha = self.albums_alpha()
+            if self.catalog:
+                self.dirs = self.catalog.dirs(self.base)
+
+            if self.dirs:
+                self.albums = self.albums_cached()
+                self.index = self.sorted_index(self.albums)
+                self.alpha = self.albums_alpha()
+                self.rescan(deep=True)
+            else:
+                self.index = self.albums_index()
+                self.albums = self.albums_data()
+                self.alpha = self.albums_alpha()
 
     def albums_alpha(self, mtag='artist'):
         '''
@@ -50,37 +81,64 @@ class MooAlbums:
 
     def albums_data(self):
         '''
-        returns dict of minimal album metadata
+        returns dict of minimal album metadata, read from the catalog
+        (if any) for albums that have not changed since last read
         '''
         logging.info("Getting ALBUMS %s", time.strftime('%X'))
 
         start = time.time()
         out = dict()
+        cached = self.catalog.load() if self.catalog else dict()
+        covers = self.catalog.covers() if self.catalog else dict()
+        parsed = 0
 
-        for path in self.index:
-            pobj = Path(path)
-            meta = self.metadata(pobj, True)
+        stale = [x for x in self.index
+                 if x not in cached or not current(x, cached[x][0])]
+        records = {x[0]: x[1:] for x in scan(stale, self.files,
+                                              workers=self.workers)}
 
-            if not meta.get('album'):
-                continue  # index, albums diverge
+        for path in self.index:
+            if path in records:
+                pruned, fpath, _, cover = records[path]
+                covers[path] = cover
+                parsed += 1
 
-            artist = meta.get('album_artist') or meta.get('artist')
+                if self.catalog:
+                    self.catalog.put(path, pruned, fpath, cover)
+            else:
+                pruned = cached[path][1]
 
-            pruned = {
-                'album': meta.get('album'),
-                'artist': artist.split(';')[0] if artist else 'None',
-                'encoding': meta.get('encoding'),
-                'genre': meta.get('genre') or 'None',
-                'mtime': meta.get('mtime', 0),
-                'year': meta['year'][:4] if meta.get('year') else 'None'}
+            if pruned and pruned.get('album'):
+                out[path] = pruned  # else index, albums diverge
 
-            out[path] = pruned
+        if self.catalog:
+            self.catalog.prune(set(self.index))
+            self.catalog.commit()
 
         self.index = list(out.keys())  # index, albums in sync
+        self.modified = time.time_ns()
+        self.covers = {x: covers[x] for x in out if covers.get(x)}
 
-        logging.info('ALBUMS Done %s (%d seconds)',
+        logging.info('ALBUMS Done %s (%d seconds, %d parsed)',
                      time.strftime('%X'),
-                     int(time.time() - start))
+                     int(time.time() - start),
+                     parsed)
+
+        return out
+
+    def albums_cached(self):
+        '''
+        returns dict of minimal album metadata from the catalog for
+        albums in known directories, without checking for changes
+        '''
+        out = dict()
+        covers = self.catalog.covers()
+
+        for path, (_, record) in self.catalog.load().items():
+            if path in self.dirs and record.get('album'):
+                out[path] = record
+
+        self.covers = {x: covers[x] for x in out if x in covers}
 
         return out
 
@@ -92,75 +150,170 @@ class MooAlbums:
         logging.info('Computing INDEX %s', time.strftime('%X'))
 
         start = time.time()
-        albums = list()  # paths that do not contain directories
-        sort_key = os.path.getmtime
+        sort_key = 'st_mtime'
 
         if sort:
             if sort == 'atime':
-                sort_key = os.path.getatime
+                sort_key = 'st_atime'
             if sort == 'ctime':
-                sort_key = os.path.getctime
+                sort_key = 'st_ctime'
 
-        for path in Path(self.base).rglob('*'):
-            leaf = True
+        self.dirs = dict()
 
-            try:
-                for child in path.iterdir():
-                    if child.is_dir():
-                        leaf = False
-                        continue
-            except NotADirectoryError:
-                continue
+        albums = walk(self.base, self.dirs)  # paths without directories
+        albums.pop(self.base, None)
 
-            if not [x for x in os.listdir(str(path)) if not x.startswith('.')]:
-                continue
+        self.files = {x: albums[x][1] for x in albums}
 
-            if leaf:
-                albums.append(str(path))
+        if self.catalog:
+            self.catalog.put_dirs(self.dirs, True)
+            self.catalog.commit()
 
         logging.info('INDEX Done %s (%d seconds)',
                      time.strftime('%X'),
                      int(time.time() - start))
 
-        return sorted(albums, key=sort_key, reverse=True)
+        return sorted(albums, reverse=True,
+                      key=lambda x: getattr(albums[x][0], sort_key))
+
+    def album_files(self, album):
+        '''
+        returns sorted list of file names in album, from the last scan
+        if the album directory has not changed since
+        '''
+        path = str(album)
+        mtime = os.stat(path).st_mtime_ns
+
+        if path in self.files and mtime == self.dirs.get(path):
+            return self.files[path]
+
+        names = sorted(x.name for x in os.scandir(path) if x.is_file())
+
+        if mtime == self.dirs.get(path):
+            self.files[path] = names
+
+        return names
+
+    def apply(self, records, removed=()):
+        '''
+        update index, albums, and alpha with dict of (added or
+        modified) album records and list of removed album paths, unless
+        there are none (keeping memos and modified as they are)
+        '''
+        if not records and not removed:
+            return
+
+        facets = self.facet_index()
+        orders = self.sort_index()
+        albums = dict(self.albums)  # copy, do not mutate while serving
+
+        for path in removed:
+            albums.pop(path, None)
+
+        albums.update(records)
+
+        facets.update(albums, records, removed)
+        orders.update(albums, records, removed)
+
+        self.index = self.sorted_index(albums)
+        self.albums = albums
+        self.alpha = self.albums_alpha()
+        self.modified = time.time_ns()
+
+        self.cache.pop(list(records) + list(removed))
+
+    def cover(self, album):
+        '''
+        returns (fpath, offset, length, mimetype) tuple locating the
+        cover image of album (path) in one of its tracks, as recorded
+        by the last scan (see reader.picture), False if album has no
+        cover image, or None if not known, or changed since
+        '''
+        found = self.covers.get(album)
+
+        if not found:
+            return None
+
+        try:
+            mtime = os.stat(found[0] or album).st_mtime_ns
+        except OSError:
+            return None
+
+        if mtime != found[4]:
+            return None
+
+        return found[:4] if found[0] else False
+
+    def counts(self, albums, metakey='genre', query=None):
+        '''
+        returns dict of album counts by metakey value in albums (a
+        subset of albums by path), memoized by query (see MooFacets)
+        '''
+        if metakey in FACETS:
+            return self.facet_index().counts(metakey, albums, query)
+
+        count = Counter()
+
+        for item in albums:
+            count[albums[item].get(metakey) or 'None'] += 1
+
+        return dict(count)
+
+    def facet_index(self):
+        '''
+        returns MooFacets for the current albums, built again if albums
+        was replaced other than by apply()
+        '''
+        facets = self.facets
+
+        if facets is None or facets.albums is not self.albums:
+            facets = MooFacets(self.albums)
+            self.facets = facets
+
+        return facets
 
     def metadata(self, album, single=False, track=None):
         '''
         returns metadata for an entire album from the album path,
-        or for a single track if single is True
+        or for a single track if single is True. Album metadata is
+        cached until the album directory changes.
         '''
-        out = dict()
+        key = str(album)
+        mtime = os.stat(key).st_mtime_ns
+        tracks = None if single else self.cache.get(key, mtime)
 
-        for ind, fpath in enumerate(sorted(Path(album).iterdir())):
-            key = str(fpath)
-            audio = mutagen.File(fpath)
-            encoding = type(audio).__name__
-            data = dict()
+        if tracks is None:
+            tracks = self.metadata_tracks(album, single)
 
-            if not audio or not hasattr(audio, 'tags'):
-                continue
+            if single is True:
+                return tracks
 
-            try:
-                data = flat_data(audio)
-                data.update(vars(audio.info))
-                data['type'] = audio.mime[0]
-            except AttributeError:
-                # hmmm
-                raise
+            self.cache.put(key, mtime, tracks)
 
-            data['encoding'] = encoding
-            data['src'] = quote(key.replace(self.base, '/static/Moo'))
+        if track:
+            for num, item in enumerate(sorted(tracks)):
+                if num + 1 == track:
+                    return tracks[item]
 
-            if 'title' not in data:
-                name, _ = os.path.splitext(fpath.name)
-                data['title'] = name
+        return tracks
 
-            if 'track' not in data:
-                data['track'] = ind + 1
+    def metadata_tracks(self, album, single=False):
+        '''
+        returns metadata for each track in album (path) read from
+        files, or for the first track if single is True
+        '''
+        out = dict()
 
-            data.update(stat(str(fpath)))
+        for ind, fname in enumerate(self.album_files(album)):
+            fpath = Path(album, fname)
+            key = str(fpath)
+            data = track_data(fpath, ind)
+
+            if not data:
+                continue
 
-            data['uri'] = fpath.as_uri()
+            data = MooTrack(data)
+            data['src'] = quote('/stream' + key[len(self.base):])
 
             out[key] = data
 
@@ -168,44 +321,204 @@ class MooAlbums:
                 return data
 
         out = parse_fnames(out)
-        tracks = sorted_tracks(out)
 
-        if track:
-            for num, item in enumerate(sorted(tracks)):
-                if num + 1 == track:
-                    return tracks[item]
+        return sorted_tracks(out)
 
-        return tracks
+    def rescan(self, deep=False, entries=False):
+        '''
+        returns summary of albums added, modified, and removed since
+        the last scan, listing only directories whose mtime changed.
+        If deep is True, also re-read albums whose first track changed.
+        If entries is True, also scan search entries (see update).
+        '''
+        logging.info('Rescanning INDEX %s', time.strftime('%X'))
+
+        start = time.time()
+        changed = list()
+        gone = set()
+        stale = set()
+
+        with self.lock:  # not while update() replaces it
+            dirs = dict(self.dirs)
+
+        for path in dirs:
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except FileNotFoundError:
+                gone.add(path)
+                continue
+
+            if mtime != dirs[path]:
+                changed.append(path)
+
+        stats = len(dirs)
+
+        if deep and self.catalog:
+            listing = set(changed)
+
+            for path, (sig, _) in self.catalog.load().items():
+                if path in self.albums and path not in listing:
+                    stats += 2
+                    if not current(path, sig):
+                        stale.add(path)
+
+        summary = self.update(changed, gone, stale, entries)
+        summary['stats'] = stats
+        summary['seconds'] = round(time.time() - start, 3)
+
+        logging.info('INDEX Rescanned %s (+%d ~%d -%d, %d stats)',
+                     time.strftime('%X'),
+                     len(summary['added']),
+                     len(summary['modified']),
+                     len(summary['removed']),
+                     stats)
+
+        return summary
 
     def sorted_albums(self, sort_key, reverse=False):
         '''
-        return OrderedDict of albums sorted by sort_key
+        return OrderedDict of albums sorted by sort_key, memoized until
+        albums change
         '''
-        tmp = list()
-        nones = list()
-        out = OrderedDict()
+        albums = self.albums
+        orders = self.sort_index()
+        key = (sort_key, reverse)
 
-        for item in self.albums:
-            facet = self.albums[item].get(sort_key)
-            data = self.albums[item]
+        if key in orders.memo and orders.albums is albums:
+            return orders.memo[key]
 
-            if facet == 'None':
-                nones.append((facet, item, data))
-            else:
-                tmp.append((facet, item, data))
+        if sort_key in SORT_KEYS:
+            out = OrderedDict(
+                (x, albums[x]) for x in orders.sort(sort_key, albums,
+                                                    reverse, nones='given'))
+        else:
+            tmp = list()
+            nones = list()
+            out = OrderedDict()
+
+            for item in albums:
+                facet = albums[item].get(sort_key)
+                data = albums[item]
+
+                if facet == 'None':
+                    nones.append((facet, item, data))
+                else:
+                    tmp.append((facet, item, data))
+
+            for tup in sorted(tmp, reverse=reverse):
+                out[tup[1]] = tup[2]
 
-        for tup in sorted(tmp, reverse=reverse):
-            out[tup[1]] = tup[2]
+            for tup in nones:
+                out[tup[1]] = tup[2]
 
-        for tup in nones:
-            out[tup[1]] = tup[2]
+        if orders.albums is albums:
+            orders.memo[key] = out
 
         return out
 
+    def update(self, changed, gone=(), stale=(), entries=False):
+        '''
+        returns summary of albums added, modified, and removed after
+        listing changed directories (and new directories below them),
+        forgetting gone directories (and everything below them), and
+        re-reading stale albums, with search index entries of albums
+        read (by path) if entries is True
+        '''
+        with self.lock:
+            prefixes = tuple(x + os.sep for x in gone)
+            gone = {x for x in self.dirs
+                    if x in gone or x.startswith(prefixes)}
+            dirs = {x: self.dirs[x] for x in self.dirs if x not in gone}
+            files = dict(self.files)
+            covers = {x: self.covers[x] for x in self.covers
+                      if x not in gone}
+            found = dict()
+
+            for path in changed:
+                found.update(walk(path, dirs))
+
+            found.pop(self.base, None)
+            candidates = set(found).union(stale).difference(gone)
+            listed = len(changed) + len(set(dirs) - set(self.dirs))
+
+            removed = [x for x in self.albums if x in gone]
+            removed += [x for x in changed
+                        if x in self.albums and x not in candidates]
+            records = dict()
+
+            for path in gone.union(changed):
+                files.pop(path, None)
+
+            for path in found:
+                files[path] = found[path][1]
+
+            scanned = dict()
+
+            for path, pruned, fpath, found, cover in scan(
+                    sorted(candidates), files, entries, self.workers):
+                scanned[path] = found
+                covers[path] = cover
+
+                if self.catalog:
+                    self.catalog.put(path, pruned, fpath, cover)
+
+                if pruned:
+                    records[path] = pruned
+                elif path in self.albums:
+                    removed.append(path)
+
+            summary = {
+                'added': sorted(x for x in records if x not in self.albums),
+                'modified': sorted(x for x in records if x in self.albums),
+                'removed': sorted(removed),
+                'listed': listed}
+
+            if entries:
+                summary['entries'] = scanned
+
+            if self.catalog:
+                self.catalog.delete(gone)
+                self.catalog.delete_dirs(gone)
+                self.catalog.put_dirs({x: dirs[x] for x in dirs
+                                       if dirs[x] != self.dirs.get(x)})
+                self.catalog.commit()
+
+            self.covers = {x: covers[x] for x in covers
+                           if covers[x] and x not in removed}
+            self.dirs = dirs
+            self.files = files
+            self.apply(records, removed)
+
+        return summary
+
+    def sort_index(self):
+        '''
+        returns MooOrders for the current albums, built again if albums
+        was replaced other than by apply()
+        '''
+        orders = self.orders
+
+        if orders is None or orders.albums is not self.albums:
+            orders = MooOrders(self.albums)
+            self.orders = orders
+
+        return orders
+
+    def sorted_index(self, albums):
+        '''
+        returns list of album paths reverse-sorted by directory mtime
+        '''
+        return sorted(albums, key=lambda x: self.dirs.get(x, 0),
+                      reverse=True)
+
     def sort_subset(self, sub, sort_key, reverse=False):
         '''
         returns OrderedDict of a subset of albums sorted by sort_key
         '''
+        if sort_key in SORT_KEYS:
+            paths = self.sort_index().sort(sort_key, sub, reverse)
+            return OrderedDict((x, self.albums.get(x)) for x in paths)
+
         tmp = list()
         out = OrderedDict()
 
@@ -223,16 +536,27 @@ class MooAlbums:
         <value> and sorted by sort_key. The sort order will be
         reversed if reverse is True.
         '''
+        albums = self.albums
         sub = dict()
 
-        for alb in self.albums:
+        if facet in FACETS:
+            for alb in self.facet_index().match(facet, value):
+                if alb in albums:
+                    sub[alb] = albums[alb]
+        else:
+            for alb in albums:
 
-            if value == 'None' and not self.albums[alb][facet]:
-                sub[alb] = self.albums[alb]
-                continue
+                if value == 'None' and not albums[alb][facet]:
+                    sub[alb] = albums[alb]
+                    continue
+
+                if value.lower() in albums[alb][facet].lower():
+                    sub[alb] = albums[alb]
 
-            if value.lower() in self.albums[alb][facet].lower():
-                sub[alb] = self.albums[alb]
+        if sort_key in SORT_KEYS:
+            paths = self.sort_index().sort(sort_key, sub, reverse,
+                                           nones='sorted')
+            return OrderedDict((x, sub[x]) for x in paths)
 
         if sort_key:
             tmp = list()
@@ -260,6 +584,73 @@ class MooAlbums:
         return sub
 
 
+def album_cover(path, files):
+    '''
+    returns (fpath, offset, length, mimetype, mtime) tuple locating
+    the first cover image in files of album path (see reader.picture)
+    and the mtime (ns) of the track holding it, (None, None, None,
+    None, album mtime) if there is none, or None if it cannot be
+    located without mutagen
+    '''
+    for fname in files:
+        fpath = os.path.join(path, fname)
+        found = reader.picture(fpath)
+
+        if found:
+            return (fpath,) + found + (os.stat(fpath).st_mtime_ns,)
+
+        if found is None and lib.track_apic(fpath):
+            return None
+
+    return (None, None, None, None, os.stat(path).st_mtime_ns)
+
+
+def album_scan(path, files=None, entries=False, covers=True):
+    '''
+    returns (record, fpath, entries, cover) tuple of minimal album
+    metadata, the track it was read from (or None), search
+    index entries for all tracks if entries is True (else None), and
+    the location of its cover image if covers is True (else None, see
+    album_cover), reading and normalizing the tags of each track once
+    '''
+    meta = dict()
+    found = list() if entries else None
+
+    if files is None:
+        files = sorted(x.name for x in os.scandir(path) if x.is_file())
+
+    for ind, fname in enumerate(files):
+        data = track_tags(Path(path, fname), ind)
+
+        if data and not meta:
+            meta = data
+
+        if not entries:
+            if meta:
+                break
+            continue
+
+        if data:
+            found.append(search_entry(path, data, ind))
+
+    if not meta or not meta.get('album'):
+        return None, meta.get('fpath') if meta else None, found, None
+
+    artist = meta.get('album_artist') or meta.get('artist')
+
+    pruned = {
+        'album': meta.get('album'),
+        'artist': artist.split(';')[0] if artist else 'None',
+        'encoding': meta.get('encoding'),
+        'genre': meta.get('genre') or 'None',
+        'mtime': meta.get('mtime', 0),
+        'year': meta['year'][:4] if meta.get('year') else 'None'}
+
+    cover = album_cover(path, files) if covers else None
+
+    return pruned, meta.get('fpath'), found, cover
+
+
 def flat_data(mfile):
     '''
     returns flattened dict from audio file metadata
@@ -292,6 +683,39 @@ def flat_data(mfile):
     return flat
 
 
+def flat_tags(enc, tags):
+    '''
+    returns flattened dict from reader tags, like flat_data
+    '''
+    flat = dict()
+
+    for item in tags:
+        values = tags[item]
+
+        if values is None:
+            continue
+
+        if enc == 'MP3':
+            for field in mp3_fields:
+                if item.startswith(field):
+                    flat[mp3_fields[field]] = ", ".join(values)
+        elif enc == 'MP4':
+            if item in mp4_fields:
+                flat[mp4_fields[item]] = values[0]
+        else:
+            flat[item] = values[0]
+
+    flat = rekey_catchall(flat)
+
+    if 'track' in flat:
+        flat['track'] = flat_val(flat, 'track')
+
+    if 'disc' in flat:
+        flat['disc'] = flat_val(flat, 'disc')
+
+    return flat
+
+
 def flat_val(data, key):
     '''
     returns flattened value from metadata
@@ -341,9 +765,12 @@ def parse_fnames(mdata):
     if not updated:
         return mdata
 
+    words = dict(words)  # shared by all tracks
+    dashes = dict(dashes)
+
     for item in mdata:
-        mdata[item]['_words'] = dict(words)
-        mdata[item]['_dashes'] = dict(dashes)
+        mdata[item]['_words'] = words
+        mdata[item]['_dashes'] = dashes
 
     return mdata
 
@@ -417,6 +844,37 @@ def rekey_mp4_tags(tags):
     return _
 
 
+def scan(paths, files=None, entries=False, workers=None, covers=True):
+    '''
+    yields (path, record, fpath, entries, cover) tuples (see
+    album_scan) for album paths, in order, reading each album once (in
+    its list of files from files by path, if given) in a pool of
+    workers
+    '''
+    files = files or dict()
+    paths = list(paths)
+
+    scanned = extract(album_scan, paths, [files.get(x) for x in paths],
+                      repeat(entries), repeat(covers), workers=workers)
+
+    for path, (record, fpath, found, cover) in zip(paths, scanned):
+        yield path, record, fpath, found, cover
+
+
+def search_entry(path, data, ind):
+    '''
+    returns search index entry [path, album, artist, title, track
+    number] from track data at index ind in album path
+    '''
+    try:
+        tnum = int(data.get('track'))
+    except (TypeError, ValueError):
+        tnum = ind + 1
+
+    return [path, data.get('album'), data.get('artist'), data.get('title'),
+            tnum]
+
+
 def sorted_tracks(meta):
     '''
     returns album metadata as dict with keys sorted by disc and then
@@ -480,8 +938,113 @@ def stat(fpath):
         'size': ostat.st_size}
 
 
-def tracks(fpath):
+def track_data(fpath, ind):
+    '''
+    returns metadata for a single track (Path) at index ind in its
+    album, or None if fpath is not a tagged audio file
+    '''
+    audio = mutagen.File(fpath)
+    encoding = type(audio).__name__
+
+    if not audio or not hasattr(audio, 'tags'):
+        return None
+
+    try:
+        data = flat_data(audio)
+        data.update(vars(audio.info))
+        data['type'] = audio.mime[0]
+    except AttributeError:
+        # hmmm
+        raise
+
+    data['encoding'] = encoding
+
+    if 'title' not in data:
+        name, _ = os.path.splitext(fpath.name)
+        data['title'] = name
+
+    if 'track' not in data:
+        data['track'] = ind + 1
+
+    data.update(stat(str(fpath)))
+
+    data['uri'] = fpath.as_uri()
+
+    return data
+
+
+def walk(top, dirs):
     '''
-    returns a list of tracks from a filepath
+    returns dict of (stat, sorted file names) tuples by album path for
+    directories at or below top that contain visible files and no
+    directories, in a single os.scandir traversal. Updates dirs (mtime
+    by path) with each directory listed, and does not descend into
+    directories already in dirs or (like rglob) symlinked directories.
     '''
-    return [str(x) for x in Path(fpath).iterdir() if x.is_file()]
+    albums = dict()
+    stack = [(top, os.stat(top), True)]
+
+    while stack:
+        path, dstat, follow = stack.pop()
+        subdirs = list()
+        files = list()
+        visible = False
+
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    subdirs.append(entry)
+                    continue
+
+                if entry.is_file():
+                    files.append(entry.name)
+
+                if not entry.name.startswith('.'):
+                    visible = True
+
+        dirs[path] = dstat.st_mtime_ns
+
+        if not subdirs and visible:
+            albums[path] = (dstat, sorted(files))
+
+        if not follow:
+            continue
+
+        for entry in subdirs:
+            if entry.path not in dirs:
+                stack.append((entry.path, entry.stat(),
+                              not entry.is_symlink()))
+
+    return albums
+
+
+def track_tags(fpath, ind):
+    '''
+    returns tag metadata (without stream info) for a single track
+    (Path) at index ind in its album, reading only text frames if
+    possible, or None if fpath is not a tagged audio file
+    '''
+    fast = reader.read(fpath)
+
+    if fast is None:
+        return track_data(fpath, ind)
+
+    encoding, tags = fast
+
+    if not tags:
+        return None
+
+    data = flat_tags(encoding, tags)
+    data['encoding'] = encoding
+
+    if 'title' not in data:
+        name, _ = os.path.splitext(fpath.name)
+        data['title'] = name
+
+    if 'track' not in data:
+        data['track'] = ind + 1
+
+    data.update(stat(str(fpath)))
+
+    return data
+
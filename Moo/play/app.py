@@ -14,20 +14,24 @@ $ flask run
 '''
 
 import datetime
-import json
+import hashlib
 import logging
 import os
 import random
 import time
 
 from collections import OrderedDict
+from itertools import islice
 from urllib.parse import quote, unquote
 
 from flask import Flask, render_template, request, abort, jsonify, redirect
+from flask import Response, make_response, send_file
 from flask_executor import Executor
+from werkzeug.http import is_resource_modified
 
 from Moo.play import config, lib, utils
-from Moo.play import MooAlbums, MooPlaylists, MooSearch
+from Moo.play import MooAlbums, MooCovers, MooPlaylists, MooSearch
+from Moo.play import MooWatcher
 
 
 app = Flask(__name__)
@@ -37,9 +41,14 @@ app.config['EXECUTOR_PROPAGATE_EXCEPTIONS'] = True
 app.config['BASE'] = lib.get_base(app.config)
 
 moo = MooAlbums(app.config)
+covers = MooCovers(app.config)
 search = MooSearch(app.config)
 executor = Executor(app)
 playlists = MooPlaylists(app.config['PLAYLISTS'])
+watcher = MooWatcher(moo, search,
+                     app.config['WATCH_DELAY'],
+                     app.config['WATCH_INTERVAL'],
+                     covers)
 
 logging.basicConfig(level=logging.INFO)
 
@@ -50,6 +59,9 @@ def before_request():
     if request.method == 'GET' and not app.config.get('BASE'):
         return render_template('base-admin.html')
 
+    if app.config['WATCH'] and watcher.thread is None:
+        watcher.start()  # in the serving process (not the reloader)
+
     return None
 
 
@@ -88,11 +100,15 @@ def admin():
         albums=moo.albums,
         ages=ages,
         base=moo.base,
+        cache=moo.cache.stats(),
         config=app.config,
+        covers=covers.stats(),
         emoji=lib.EMOJI,
+        prewarm=executor.futures._state('prewarm_covers'),
         sindex=search.index,
         tasks=executor.futures._state('build_search'),
-        updated=updated)
+        updated=updated,
+        watcher=watcher)
 
 
 @app.route('/album/<path:alkey>')
@@ -101,10 +117,11 @@ def album_route(alkey):
     alkey = '/'.join([app.config['BASE'], alkey])
 
     try:
-        alb = moo.subset('artist', moo.albums[alkey]['artist'])
+        artist = moo.albums[alkey]['artist']
+        alb = moo.subset('artist', artist)
         ind = list(alb.keys())
 
-        return serve_album(alkey, ind, alb)
+        return serve_album(alkey, ind, alb, query=('artist', artist))
 
     except (FileNotFoundError, KeyError):
         abort(404, 'No albums with alkey: {}'.format(alkey))
@@ -126,7 +143,7 @@ def alpha_route(letter):
     ind = list(alb.keys())
 
     try:
-        return serve_album(ind[0], ind, alb)
+        return serve_album(ind[0], ind, alb, query=('alpha', letter))
 
     except IndexError:
         abort(404, 'No albums matching: {}'.format(letter))
@@ -139,7 +156,7 @@ def artist_route(artist):
         alb = moo.subset('artist', artist, 'year', True)
         ind = list(alb.keys())
 
-        return serve_album(ind[0], ind, alb)
+        return serve_album(ind[0], ind, alb, query=('artist', artist))
 
     except (IndexError, KeyError):
         abort(404, 'No albums with artist: {}'.format(artist))
@@ -164,18 +181,25 @@ def base_admin():
     if not os.path.exists(base_input):
         abort(400, f'invalid path: {base_input}')
 
+    rebase = base_input != moo.base
+
     app.config['BASE'] = base_input
 
     lib.base_write(base_input)
-    lib.base_link(base_input)
 
-    moo.base = base_input
-    moo.index = moo.albums_index()
-    moo.albums = moo.albums_data()
-    moo.alpha = moo.albums_alpha()
+    if rebase or not moo.dirs:
+        moo.base = base_input
+        moo.index = moo.albums_index()
+        moo.albums = moo.albums_data()
+        moo.alpha = moo.albums_alpha()
+    else:
+        moo.rescan()
 
     search.base = base_input
 
+    if app.config['COVERS_PREWARM']:
+        prewarm_covers(moo.index)
+
     return redirect('/')
 
 
@@ -197,7 +221,7 @@ def format_route(encoding):
         alb = moo.subset('encoding', encoding, 'year', True)
         ind = list(alb.keys())
 
-        return serve_album(ind[0], ind, alb)
+        return serve_album(ind[0], ind, alb, query=('encoding', encoding))
 
     except IndexError:
         abort(404, 'No albums with encoding: {}'.format(encoding))
@@ -210,7 +234,7 @@ def genre_label(label):
         alb = moo.subset('genre', label, 'year', True)
         ind = list(alb.keys())
 
-        return serve_album(ind[0], ind, alb)
+        return serve_album(ind[0], ind, alb, query=('genre', label))
 
     except IndexError:
         abort(404, 'No albums with genre: {}'.format(label))
@@ -241,13 +265,70 @@ def history():
 @app.route('/img/<path:alkey>')
 def img_alkey(alkey):
     '''
-    send HTTP response with album image data
+    send HTTP response with album image data, read from its location
+    in a track (recorded by the last scan) at full size, or from the
+    covers cache (at a standard size fit to the size arg) if configured,
+    or 304 (Not Modified) if the album has not changed since the
+    client got it
     '''
-    path = os.path.join(app.config['BASE'], alkey)
+    path = unquote(os.path.join(app.config['BASE'], alkey))
+    size = request.args.get('size', type=int)
+    size = covers.fit(size) if covers.root else None
+    location = moo.cover(path)
+    max_age = app.config['COVER_MAX_AGE']
+
+    try:
+        if location:
+            mtime = os.stat(location[0]).st_mtime_ns
+            tag = etag(location, mtime, size)
+        elif location is False:
+            mtime = os.stat(path).st_mtime_ns
+            tag = etag(mtime)
+        else:
+            stamp, mtime = album_stamp(path)
+            tag = etag(stamp, size)
+    except (FileNotFoundError, NotADirectoryError):
+        abort(404, 'No album with alkey: {}'.format(alkey))
+
+    if fresh(tag, mtime):
+        return cached(Response(status=304), tag, mtime, max_age)
+
+    if location is False:
+        return cached(app.send_static_file('ico/cover.png'),
+                      tag, mtime, max_age)
+
+    if location and not size:
+        try:
+            return cached(Response(lib.picture(*location[:3]),
+                                   mimetype=location[3]),
+                          tag, mtime, max_age)
+        except (OSError, ValueError) as err:  # changed since located
+            logging.warning('Cannot read cover %s: %s', location[0], err)
+            location = None
+
+    if covers.root:
+        try:
+            found = covers.get(path, size, location)
+        except (FileNotFoundError, NotADirectoryError):
+            abort(404, 'No album with alkey: {}'.format(alkey))
+
+        if found:
+            return cached(send_file(found[0], mimetype=found[1], etag=False),
+                          tag, mtime, max_age)
+
+        if location:  # cannot be resized, send it full size
+            try:
+                return cached(Response(lib.picture(*location[:3]),
+                                       mimetype=location[3]),
+                              tag, mtime, max_age)
+            except (OSError, ValueError) as err:
+                logging.warning('Cannot read cover %s: %s', location[0], err)
+
+        return cached(app.send_static_file('ico/cover.png'),
+                      tag, mtime, max_age)
 
     try:
-        path = os.path.join(app.config['BASE'], alkey)
-        return lib.cover(unquote(path))
+        return cached(lib.cover(path), tag, mtime, max_age)
     except TypeError:
         return app.send_static_file('ico/cover.png')
 
@@ -390,7 +471,26 @@ def list_rename():
 
 @app.route('/meta/<path:source>')
 def meta_route(source):
-    return moo.metadata(os.path.join(moo.base, source))
+    '''
+    send album track metadata as JSON, or 304 (Not Modified) if the
+    album has not changed since the client got it
+    '''
+    path = os.path.join(moo.base, source)
+
+    try:
+        stamp, mtime = album_stamp(path)
+    except (FileNotFoundError, NotADirectoryError):
+        abort(404, 'No album with source: {}'.format(source))
+
+    tag = etag(stamp)
+
+    if fresh(tag, mtime):
+        return cached(Response(status=304), tag, mtime)
+
+    meta = moo.metadata(path)
+
+    return cached(jsonify({x: dict(meta[x].items()) for x in meta}),
+                  tag, mtime)
 
 
 @app.route('/None')
@@ -412,7 +512,7 @@ def none():
         ind = list(alb.keys())
         alk = ind[0]
 
-        return serve_album(alk, ind, alb)
+        return serve_album(alk, ind, alb, query=('None',))
 
     except IndexError:
         abort(404, 'No albums without metadata!')
@@ -427,7 +527,7 @@ def new():
     for path in ind:
         alb[path] = moo.albums.get(path)
 
-    return serve_album(str(ind[0]), ind, alb)
+    return serve_album(str(ind[0]), ind, alb, query=('new',))
 
 
 @app.route('/play/<name>', defaults={'index': 1})
@@ -468,6 +568,12 @@ def repeat_list(name, index):
                            playlist=playlists.lists[name])
 
 
+@app.route('/prewarm-covers')
+def prewarm_route():
+    '''start filling the covers cache (if not running)'''
+    return jsonify(prewarm_covers(moo.index))
+
+
 @app.route('/shuffle/<name>')
 def shuffle_list(name):
     '''
@@ -523,15 +629,33 @@ def rando():
         redirect('/random')  # try again
 
 
+@app.route('/rescan')
+def rescan_route():
+    '''render JSON summary of albums changed since the last scan'''
+    summary = moo.rescan()
+    covers.remove(summary['removed'])
+
+    if app.config['COVERS_PREWARM'] and (summary['added']
+                                         or summary['modified']):
+        prewarm_covers(moo.index)
+
+    return jsonify(summary)
+
+
 @app.route('/search', defaults={'terms': None}, methods=['GET', 'POST'])
 @app.route('/search/<path:terms>', methods=['GET', 'POST'])
 def search_route(terms):
-    '''render search results'''
+    '''render (a page of) ranked search results'''
 
     if request.method == 'POST':
         terms = request.form.get('search-input')
 
-    albums, artists, tracks = search.find(terms)
+    limit = request.args.get('limit', app.config['SEARCH_PAGE'], type=int)
+    limit = max(1, limit)
+    offset = max(0, request.args.get('offset', 0, type=int))
+
+    albums, artists, tracks, totals = search.find(terms, limit, offset)
+    end = offset + limit
 
     return render_template(
         'search-results.html',
@@ -539,8 +663,60 @@ def search_route(terms):
         artists=artists,
         tracks=tracks,
         emoji=lib.EMOJI,
+        limit=limit,
+        next=end if end < max(totals.values()) else None,
+        offset=offset,
         sindex=search.index,
-        terms=terms)
+        terms=terms,
+        totals=totals)
+
+
+@app.route('/stream/<path:alkey>/<track>')
+def stream_route(alkey, track):
+    '''
+    send audio file track (name) of album alkey, with byte ranges (206
+    Partial Content) and conditional requests, resolved from the albums
+    and files of the last scan rather than the file system
+    '''
+    path = os.path.join(moo.base, alkey)
+
+    if path not in moo.albums:
+        abort(404, 'No album with alkey: {}'.format(alkey))
+
+    names = moo.files.get(path)
+
+    if names is None:  # not listed since read from the catalog
+        names = moo.album_files(path)
+
+    if track not in names:
+        abort(404, 'No track {} in album: {}'.format(track, alkey))
+
+    try:
+        return send_file(os.path.join(path, track), conditional=True,
+                         max_age=app.config['STREAM_MAX_AGE'])
+    except FileNotFoundError:
+        abort(404, 'No track {} in album: {}'.format(track, alkey))
+
+
+@app.route('/suggest')
+def suggest_route():
+    '''render JSON of album, artist, and track completions of q'''
+    prefix = request.args.get('q', '')
+    limit = request.args.get('limit', app.config['SUGGEST_LIMIT'], type=int)
+    found = search.suggest(prefix, max(1, min(limit, 100)))
+
+    return jsonify(
+        albums=[{'album': x[1],
+                 'artist': x[2],
+                 'href': '/album' + quote(x[0])} for x in found['albums']],
+        artists=[{'artist': x[2],
+                  'href': '/artist/' + quote(x[2])}
+                 for x in found['artists']],
+        q=prefix,
+        tracks=[{'album': x[1],
+                 'artist': x[2],
+                 'href': '/track/%d%s' % (x[4], quote(x[0])),
+                 'title': x[3]} for x in found['tracks']])
 
 
 @app.route('/track/<tnum>/<path:alkey>')
@@ -549,9 +725,11 @@ def track_route(tnum, alkey):
     alkey = '/'.join([moo.base, unquote(alkey)])
 
     try:
-        alb = moo.subset('genre', moo.albums[alkey]['genre'])
+        genre = moo.albums[alkey]['genre']
+        alb = moo.subset('genre', genre)
 
-        return serve_album(alkey, list(alb.keys()), alb, tnum)
+        return serve_album(alkey, list(alb.keys()), alb, tnum,
+                           query=('genre', genre))
 
     except FileNotFoundError:
         abort(404)
@@ -570,7 +748,7 @@ def year_route(year):
 
         ind = list(alb.keys())
 
-        return serve_album(ind[0], ind, alb)
+        return serve_album(ind[0], ind, alb, query=('year', year))
 
     except IndexError:
         abort(404, 'No albums with year: {}'.format(year))
@@ -579,14 +757,18 @@ def year_route(year):
 @executor.job
 def build(albindex):
     '''
-    build search index from album index and write to outfile
+    build search index from album index (extracting only albums
+    changed since the last build) and write to outfile
     '''
     logging.info("Started build job %s", time.strftime('%X'))
 
     outfile = app.config['SINDEX']
 
     start = time.time()
-    sindex = search.search_index(albindex)
+    sindex, sigs = search.build_index(albindex,
+                                      catalog=moo.catalog,
+                                      workers=app.config['WORKERS'],
+                                      files=moo.files)
     seconds = int(time.time() - start)
 
     out = {
@@ -596,20 +778,36 @@ def build(albindex):
 
     logging.info('>> Moodex %s', out)
 
-    data = out
+    data = dict(out)
     data['results'] = sindex
 
-    search.index = data
-
-    with open(outfile, 'w') as _:
-        _.write(json.dumps(data))
-        logging.info('Wrote %d bytes to %s', _.tell(), outfile)
+    if search.save(data, export=app.config['SINDEX_EXPORT']) and moo.catalog:
+        moo.catalog.put_searched(sigs)
+        moo.catalog.commit()
 
     logging.info('Finished build job %s', time.strftime('%X'))
 
     return out
 
 
+@executor.job
+def prewarm(albindex):
+    '''
+    fill the covers cache with the cover images of albums in album
+    index (newest first), yielding to requests between albums
+    '''
+    logging.info("Started prewarm job %s", time.strftime('%X'))
+
+    out = covers.prewarm(albindex, moo.cover,
+                         app.config['COVERS_PREWARM_PAUSE'])
+
+    logging.info('Finished prewarm job %s (%d albums, %d extracted, '
+                 '%.1f albums/s)', time.strftime('%X'),
+                 out['done'], out['warmed'], out['rate'])
+
+    return out
+
+
 ################################################################
 
 
@@ -639,17 +837,62 @@ def build_search_result():
     return fut.result()
 
 
-def serve_album(alkey, index, albums, track_num=1):
+def prewarm_covers(index):
+    '''
+    submit a prewarm_covers task for albums in index (if covers are
+    cached and it is not pending or running), returns its state
+    '''
+    if not covers.root:
+        return None
+
+    state = executor.futures._state('prewarm_covers')
+
+    if state in ('PENDING', 'RUNNING'):
+        return state
+
+    executor.futures.pop('prewarm_covers')
+    prewarm.submit_stored('prewarm_covers', list(index))
+
+    return 'Submitted prewarm_covers task %s' % time.strftime('%X')
+
+
+def serve_album(alkey, index, albums, track_num=1, query=None):
     '''
     serve album and selected (or first) track and (all) or part of the
-    <index> and <albums>
+    <index> and <albums>, matched by <query> (to memoize facet counts),
+    or a page of <albums> as JSON if requested with an offset, or 304
+    (Not Modified) if neither the album, albums, nor history have
+    changed since the client got it
     '''
+    if 'offset' in request.args:
+        return albums_page(albums)
+
+    if request.path.startswith('/track') and alkey in moo.albums:
+        write_history(alkey)
+
+    try:
+        stamp, mtime = album_stamp(alkey)
+    except (FileNotFoundError, NotADirectoryError):
+        stamp, mtime = None, 0  # let album_data decide
+
+    try:
+        hist = os.stat(app.config['HISTORY'])
+        hist = (hist.st_mtime_ns, hist.st_size)
+    except FileNotFoundError:
+        hist = (0, 0)
+
+    tag = etag(alkey, stamp, moo.modified, hist)
+    mtime = max(mtime, moo.modified, hist[0])
+
+    if fresh(tag, mtime):
+        return cached(Response(status=304), tag, mtime)
+
     album, data = album_data(alkey)
 
     if data:
         tind = int(track_num) - 1
         dkey = sorted(data.keys())[tind]
-        control = lib.control(app.config['BASE'], index, data, tind)
+        control = lib.control(data, tind)
         track = data.get(dkey)
         info = lib.album_info(track, data)
     else:
@@ -660,22 +903,20 @@ def serve_album(alkey, index, albums, track_num=1):
         info = None
 
     counts = {
-        'artist': lib.counts(albums, metakey='artist'),
-        'format': lib.counts(albums, metakey='encoding'),
-        'genre': lib.counts(albums),
-        'year': lib.counts(albums, metakey='year'),
+        'artist': moo.counts(albums, 'artist', query),
+        'format': moo.counts(albums, 'encoding', query),
+        'genre': moo.counts(albums, 'genre', query),
+        'year': moo.counts(albums, 'year', query),
     }
 
-    if request.path.startswith('/track'):
-        write_history(alkey)
-
-    return render_template(
+    return cached(make_response(render_template(
         'index.html',
         albums=albums,
         album=album,
         alpha=moo.alpha,
         alkey=alkey.replace(app.config['BASE'], ''),
         base=app.config['BASE'],
+        cards=list(islice(albums, app.config['COVERS_PAGE'])),
         config=app.config,
         control=control,
         counts=counts,
@@ -686,7 +927,7 @@ def serve_album(alkey, index, albums, track_num=1):
         metadata=data,
         prefixed=None,  # lib.prefixed(titles),
         total=len(index),
-        track=track)
+        track=track)), tag, mtime)
 
 
 def write_history(alkey, maxlen=1000):
@@ -695,13 +936,13 @@ def write_history(alkey, maxlen=1000):
     '''
     fname = app.config['HISTORY']
     alkey = alkey.replace(app.config['BASE'], '')
-    tmp = list()
+    lines = list()
 
     if os.path.exists(fname):
         with open(fname) as _:
-            for line in _:
-                if alkey not in line:
-                    tmp.append(line.strip())
+            lines = [x.strip() for x in _]
+
+    tmp = [x for x in lines if alkey not in x]
 
     if not tmp:
         tmp.append(alkey)
@@ -711,11 +952,44 @@ def write_history(alkey, maxlen=1000):
 
     tmp = tmp[-maxlen:]
 
+    if tmp == lines:
+        return  # unchanged, keep mtime (see serve_album)
+
     with open(fname, 'w') as _:
         for key in tmp:
             _.write(key + "\n")
 
 
+def albums_page(albums, maxlen=500):
+    '''
+    return JSON page of (album cover) cards for <albums> from offset
+    and limit request args, and the offset of the next page (or None)
+    '''
+    base = app.config['BASE'] + '/'
+    limit = request.args.get('limit', app.config['COVERS_PAGE'], type=int)
+    limit = max(1, min(limit, maxlen))
+    offset = max(0, request.args.get('offset', 0, type=int))
+    cards = list()
+
+    for path in islice(albums, offset, offset + limit):
+        album = albums[path] or dict()
+        cards.append({
+            'album': album.get('album'),
+            'artist': album.get('artist'),
+            'genre': album.get('genre'),
+            'href': quote(path.replace(base, '')),
+            'year': album.get('year')})
+
+    end = offset + len(cards)
+
+    return jsonify(
+        albums=cards,
+        limit=limit,
+        next=end if end < len(albums) else None,
+        offset=offset,
+        total=len(albums))
+
+
 def album_data(path):
     '''
     return (alkey, metadata) tuple from album path
@@ -727,3 +1001,68 @@ def album_data(path):
         return path, moo.metadata(path)
     except FileNotFoundError:
         abort(404)
+
+
+def album_stamp(path):
+    '''
+    returns (stamp, mtime) tuple of the stat of album path and its
+    files (name, mtime, size), to derive validators from without
+    reading any, and the latest mtime (ns) among them
+    '''
+    dmtime = os.stat(path).st_mtime_ns
+    files = list()
+
+    for entry in os.scandir(path):
+        if entry.is_file():
+            fstat = entry.stat()
+            files.append((entry.name, fstat.st_mtime_ns, fstat.st_size))
+
+    files.sort()
+
+    return (dmtime, files), max([dmtime] + [x[1] for x in files])
+
+
+def cached(response, tag, mtime, max_age=None):
+    '''
+    returns response with validators (ETag, Last-Modified from mtime
+    in ns) and Cache-Control, to be reused for max_age seconds, or
+    only after revalidation (see fresh) if None
+    '''
+    response.set_etag(tag)
+    response.last_modified = mtime // 10**9
+
+    if max_age:
+        response.cache_control.max_age = max_age
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+    else:
+        response.cache_control.no_cache = True
+
+    return response
+
+
+def etag(*parts):
+    '''
+    returns entity tag for a response derived from parts (stats, not
+    contents), and the app VERSION
+    '''
+    value = repr((app.config['VERSION'],) + parts)
+
+    return hashlib.sha1(
+        value.encode('utf-8', 'surrogateescape')).hexdigest()[:20]
+
+
+def fresh(tag, mtime):
+    '''
+    returns True if the request is conditional (If-None-Match or
+    If-Modified-Since) and the client copy is current, given the
+    response tag and mtime (ns)
+    '''
+    if not (request.if_none_match or request.if_modified_since):
+        return False
+
+    modified = datetime.datetime.fromtimestamp(mtime // 10**9,
+                                               datetime.timezone.utc)
+
+    return not is_resource_modified(request.environ, tag,
+                                    last_modified=modified)
@@ -0,0 +1,79 @@
+'''
+MooCache class
+'''
+
+import threading
+
+from collections import OrderedDict
+
+
+class MooCache:
+
+    '''
+    returns an instance of MooCache, a bounded (least recently used)
+    cache of values keyed by path and valid only while the stamp (e.g.
+    directory mtime) they were stored with is unchanged
+    '''
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.lock = threading.Lock()
+        self.misses = 0
+
+    def clear(self):
+        '''
+        remove all entries
+        '''
+        with self.lock:
+            self.entries.clear()
+
+    def get(self, key, stamp):
+        '''
+        returns value cached for key with stamp, or None
+        '''
+        with self.lock:
+            entry = self.entries.get(key)
+
+            if entry is None or entry[0] != stamp:
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+
+            return entry[1]
+
+    def pop(self, keys):
+        '''
+        remove entries for keys
+        '''
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+
+    def put(self, key, stamp, value):
+        '''
+        cache value for key with stamp, evicting the least recently
+        used entries beyond maxsize
+        '''
+        if not self.maxsize:
+            return
+
+        with self.lock:
+            self.entries[key] = (stamp, value)
+            self.entries.move_to_end(key)
+
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def stats(self):
+        '''
+        returns dict of cache size and hit/miss counts
+        '''
+        return {
+            'entries': len(self.entries),
+            'hits': self.hits,
+            'maxsize': self.maxsize,
+            'misses': self.misses}
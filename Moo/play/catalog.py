@@ -0,0 +1,243 @@
+'''
+MooCatalog class
+'''
+
+import logging
+import os
+import sqlite3
+import threading
+
+
+SCHEMA_VERSION = 3
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS albums (
+    path TEXT PRIMARY KEY,
+    dmtime INTEGER,
+    fpath TEXT,
+    fmtime INTEGER,
+    fsize INTEGER,
+    album TEXT,
+    artist TEXT,
+    encoding TEXT,
+    genre TEXT,
+    mtime REAL,
+    year TEXT,
+    cpath TEXT,
+    coffset INTEGER,
+    clength INTEGER,
+    cmime TEXT,
+    cmtime INTEGER);
+
+CREATE TABLE IF NOT EXISTS dirs (
+    path TEXT PRIMARY KEY,
+    mtime INTEGER);
+
+CREATE TABLE IF NOT EXISTS searched (
+    path TEXT PRIMARY KEY,
+    dmtime INTEGER,
+    tracks INTEGER,
+    fmtime INTEGER,
+    fsize INTEGER)
+'''
+
+
+class MooCatalog:
+
+    '''
+    returns an instance of MooCatalog, a persistent (SQLite) store of
+    album records keyed by album path and the stat of the track the
+    record was read from, with the location of album cover images
+    '''
+
+    fields = ('album', 'artist', 'encoding', 'genre', 'mtime', 'year')
+
+    def __init__(self, fpath):
+        self.fpath = fpath
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(fpath, check_same_thread=False)
+
+        version = self.conn.execute('PRAGMA user_version').fetchone()[0]
+
+        if version != SCHEMA_VERSION:
+            logging.info('Resetting CATALOG %s (version %d)', fpath, version)
+            self.conn.execute('DROP TABLE IF EXISTS albums')
+            self.conn.execute('DROP TABLE IF EXISTS dirs')
+            self.conn.execute('DROP TABLE IF EXISTS searched')
+            self.conn.execute('PRAGMA user_version = %d' % SCHEMA_VERSION)
+
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def commit(self):
+        '''
+        commit pending changes to the catalog file
+        '''
+        with self.lock:
+            self.conn.commit()
+
+    def covers(self):
+        '''
+        returns dict of cover image locations (see album_cover) by
+        album path, for albums with a known location or none
+        '''
+        with self.lock:
+            rows = self.conn.execute(
+                'SELECT path, cpath, coffset, clength, cmime, cmtime '
+                'FROM albums WHERE cmtime IS NOT NULL')
+
+            return {x[0]: x[1:] for x in rows}
+
+    def delete(self, paths):
+        '''
+        remove albums with paths from the catalog
+        '''
+        with self.lock:
+            self.conn.executemany(
+                'DELETE FROM albums WHERE path = ?',
+                [(path,) for path in paths])
+
+    def delete_dirs(self, paths):
+        '''
+        remove directories with paths from the catalog
+        '''
+        with self.lock:
+            self.conn.executemany(
+                'DELETE FROM dirs WHERE path = ?',
+                [(path,) for path in paths])
+
+    def dirs(self, base):
+        '''
+        returns dict of directory mtimes (ns) by path under base
+        '''
+        with self.lock:
+            rows = self.conn.execute('SELECT path, mtime FROM dirs')
+
+            return {x[0]: x[1] for x in rows
+                    if x[0] == base or x[0].startswith(base + os.sep)}
+
+    def load(self):
+        '''
+        returns dict of (signature, record) tuples by album path
+        '''
+        out = dict()
+
+        with self.lock:
+            rows = self.conn.execute(
+                'SELECT path, dmtime, fpath, fmtime, fsize, '
+                'album, artist, encoding, genre, mtime, year FROM albums')
+
+            for row in rows:
+                out[row[0]] = (row[1:5], dict(zip(self.fields, row[5:])))
+
+        logging.info('Read %d albums from CATALOG %s', len(out), self.fpath)
+
+        return out
+
+    def prune(self, paths):
+        '''
+        remove albums not in paths from the catalog
+        '''
+        with self.lock:
+            known = [x[0] for x in self.conn.execute(
+                'SELECT path FROM albums')]
+
+        self.delete([x for x in known if x not in paths])
+
+    def put_dirs(self, dirs, replace=False):
+        '''
+        write dict of directory mtimes (ns) by path to the catalog,
+        replacing all known directories if replace is True
+        '''
+        with self.lock:
+            if replace:
+                self.conn.execute('DELETE FROM dirs')
+
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO dirs VALUES (?, ?)',
+                dirs.items())
+
+    def put_searched(self, sigs):
+        '''
+        write dict of album signatures (see album_signature) by path,
+        as of the last search index build, replacing all known
+        '''
+        with self.lock:
+            self.conn.execute('DELETE FROM searched')
+            self.conn.executemany(
+                'INSERT INTO searched VALUES (?, ?, ?, ?, ?)',
+                [(x,) + tuple(sigs[x]) for x in sigs])
+
+    def put(self, path, record, fpath=None, cover=None):
+        '''
+        write album record read from track fpath (None if the album
+        has no metadata) and its cover image location (see album_cover,
+        None if not known) to the catalog
+        '''
+        sig = signature(path, fpath)
+        record = record or dict()
+        cover = cover or (None,) * 5
+
+        with self.lock:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO albums VALUES '
+                '(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (path,) + sig + tuple(record.get(x) for x in self.fields)
+                + tuple(cover))
+
+    def searched(self):
+        '''
+        returns dict of album signatures by path as of the last search
+        index build
+        '''
+        with self.lock:
+            rows = self.conn.execute(
+                'SELECT path, dmtime, tracks, fmtime, fsize FROM searched')
+
+            return {x[0]: x[1:] for x in rows}
+
+
+def album_signature(path, names=None):
+    '''
+    returns (album mtime, tracks, latest track mtime, total track
+    size) tuple for album path, or for file names in it if given
+    '''
+    dmtime = os.stat(path).st_mtime_ns
+    count = fmtime = fsize = 0
+
+    if names is None:
+        stats = [x.stat() for x in os.scandir(path) if x.is_file()]
+    else:
+        stats = [os.stat(os.path.join(path, x)) for x in names]
+
+    for fstat in stats:
+        count += 1
+        fmtime = max(fmtime, fstat.st_mtime_ns)
+        fsize += fstat.st_size
+
+    return (dmtime, count, fmtime, fsize)
+
+
+def current(path, sig):
+    '''
+    returns True if the stat of album path (and the track its record
+    was read from) matches signature
+    '''
+    try:
+        return signature(path, sig[1]) == tuple(sig)
+    except FileNotFoundError:
+        return False
+
+
+def signature(path, fpath=None):
+    '''
+    returns (album mtime, fpath, fpath mtime, fpath size) tuple
+    '''
+    dstat = os.stat(path)
+
+    if not fpath:
+        return (dstat.st_mtime_ns, None, None, None)
+
+    fstat = os.stat(fpath)
+
+    return (dstat.st_mtime_ns, fpath, fstat.st_mtime_ns, fstat.st_size)
@@ -8,10 +8,31 @@ VERSION = '0.4'
 WWW = 'https://github.com/siznax/moo'
 
 BASEFILE = 'BASE'
-SINDEX = 'search.json'
+CATALOG = 'catalog.db'
+COVERS = 'covers'
+SINDEX = 'search.idx'
+SINDEX_JSON = 'search.json'
 HISTORY = 'HISTORY'
 PLAYLISTS = 'playlists.json'
 
+COVERS_PAGE = 60  # album covers per page (more load on scroll)
+COVERS_PREWARM = False  # fill covers cache after rescans (see /prewarm-covers)
+COVERS_PREWARM_PAUSE = 0.01  # seconds to yield after each album prewarmed
+COVER_MAX_AGE = 86400  # seconds browsers may reuse covers without asking
+COVER_RESIZES = 2  # cover thumbnails resized at once (others wait)
+COVER_SIZES = (128, 256, 512)  # cover thumbnail sizes (with Pillow)
+METADATA_CACHE = 256  # albums of track metadata kept in memory (0: none)
+SEARCH_PAGE = 100  # search results of each kind per page
+SINDEX_DELTA = 10000  # search entries changed in memory before writing SINDEX
+SINDEX_EXPORT = False  # also write SINDEX_JSON after each search build
+STREAM_MAX_AGE = 3600  # seconds browsers may reuse audio without asking
+SUGGEST_LIMIT = 10  # search completions of each kind (see /suggest)
+WORKERS = None  # tag extraction processes (None: one per CPU)
+
+WATCH = False  # keep albums up to date with changes under BASE
+WATCH_DELAY = 2.0  # seconds without changes before updating
+WATCH_INTERVAL = 60  # seconds between rescans if inotify is unavailable
+
 ARTIST_BUTTONS = {
     # 'nickname': 'Artist',
 }
@@ -0,0 +1,347 @@
+'''
+MooCovers class
+'''
+
+import hashlib
+import io
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from . import lib
+
+try:
+    from PIL import Image
+except ImportError:  # optional, covers are served full size without it
+    Image = None
+
+
+EXTENSIONS = {'image/png': '.png'}  # else .jpg
+
+MIMETYPES = {'.png': 'image/png'}  # else image/jpeg
+
+
+class MooCovers:
+
+    '''
+    returns an instance of MooCovers, an on-disk cache of album cover
+    images extracted from tracks, at full size and (with Pillow)
+    downscaled to standard sizes, content-addressed by album path and
+    the mtime of the track the image was extracted from (older images
+    of an album are removed when it is extracted again). Images whose
+    location in a track is known are resized from there, without a
+    full size copy.
+    '''
+
+    def __init__(self, config):
+        self.root = config.get('COVERS')
+        self.sizes = sorted(config.get('COVER_SIZES') or ())
+        self.extracted = 0
+        self.hits = 0
+        self.lock = threading.Lock()
+        self.misses = 0
+        self.progress = None  # see prewarm()
+        self.resizes = threading.BoundedSemaphore(
+            config.get('COVER_RESIZES') or 1)
+
+        if self.root:
+            self.root = os.path.abspath(self.root)
+            os.makedirs(self.root, exist_ok=True)
+
+            if Image is None and self.sizes:
+                logging.info('COVER_SIZES requires Pillow, ignoring')
+
+    def extract(self, album, location=None):
+        '''
+        extract the first cover image in tracks of album to the cache
+        (or record that it has none), or only record the track it is in
+        if its location there is known (see MooAlbums.cover), returns
+        True if found
+        '''
+        found = None
+
+        if location:
+            found = location[0]
+        else:
+            for track in sorted(os.scandir(album), key=lambda x: x.name):
+                if track.is_file():
+                    apic = lib.track_apic(track.path)
+
+                    if apic:
+                        found = track.path
+                        data, mtype = lib.apic_data(apic)
+                        break
+
+        with self.lock:
+            self.extracted += 1
+
+        mtime = None
+
+        if found:
+            mtime = os.stat(found).st_mtime_ns
+
+            if not location:
+                ext = EXTENSIONS.get(mtype, '.jpg')
+                write(self.path(album, mtime, None, ext), data)
+
+        write(self.marker(album),
+              (found or '').encode('utf-8', 'surrogateescape'))
+
+        self.evict(album, mtime)
+
+        return found is not None
+
+    def evict(self, album, mtime=None):
+        '''
+        remove cached cover images of album (at all sizes) extracted
+        from a track with another mtime (ns), or all if mtime is None
+        '''
+        prefix = digest(album) + '-'
+        keep = '%s%d-' % (prefix, mtime) if mtime is not None else None
+        folder = os.path.join(self.root, prefix[:2])
+
+        for entry in os.scandir(folder):
+            if (entry.name.startswith(prefix)
+                    and not (keep and entry.name.startswith(keep))):
+                try:
+                    os.unlink(entry.path)
+                except FileNotFoundError:
+                    pass
+
+    def fit(self, size):
+        '''
+        returns the smallest standard size at least size, or None for
+        full size
+        '''
+        if not size or Image is None:
+            return None
+
+        return next((x for x in self.sizes if x >= size), None)
+
+    def get(self, album, size=None, location=None):
+        '''
+        returns (path, mimetype) tuple of the cached cover image of
+        album (at a standard size fit to size), extracted and resized
+        (from its location in a track, if known) if need be, or None if
+        album has no cover image (or it cannot be resized)
+        '''
+        size = self.fit(size)
+        location = location if size else None  # full size: copy it
+        found = self.lookup(album, size, location)
+
+        with self.lock:
+            if found is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        if found is None and self.extract(album, location):
+            found = self.lookup(album, size, location)
+
+        return found or None
+
+    def lookup(self, album, size, location=None):
+        '''
+        returns (path, mimetype) tuple of the cached cover image of
+        album at size, resized from the cached full size image (or from
+        its location in a track) if need be, False if album is known to
+        have none, or None if not cached (or stale)
+        '''
+        marker = self.marker(album)
+
+        try:
+            with open(marker, 'rb') as _:
+                source = _.read().decode('utf-8', 'surrogateescape')
+
+            if not source:  # no image, until album changes
+                if os.stat(album).st_mtime_ns > os.stat(marker).st_mtime_ns:
+                    return None
+                return False
+
+            mtime = os.stat(source).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+        if location and location[0] != source:
+            return None  # moved to another track since
+
+        if size:
+            path = self.path(album, mtime, size, '.jpg')
+
+            if os.path.exists(path):
+                return path, 'image/jpeg'
+
+        full = None
+
+        for ext in ('.jpg', '.png'):
+            if os.path.exists(self.path(album, mtime, None, ext)):
+                full = self.path(album, mtime, None, ext)
+                mtype = MIMETYPES.get(ext, 'image/jpeg')
+                break
+
+        if not size or not (full or location):
+            return (full, mtype) if full else None
+
+        with self.resizes:  # bound CPU and memory used by requests
+            try:
+                if not os.path.exists(path):  # resized while waiting
+                    resize(full or io.BytesIO(lib.picture(*location[:3])),
+                           path, size)
+            except (OSError, ValueError) as err:  # not an image, or moved
+                logging.warning('Cannot resize %s: %s',
+                                full or location[0], err)
+                return (full, mtype) if full else None
+
+        return path, 'image/jpeg'
+
+    def marker(self, album):
+        '''
+        returns cache path of the marker naming the track the cover
+        image of album was extracted from (empty if it has none)
+        '''
+        name = digest(album) + '.src'
+
+        return os.path.join(self.root, name[:2], name)
+
+    def remove(self, albums):
+        '''
+        remove cached cover images (and markers) of albums (paths)
+        '''
+        if not self.root:
+            return
+
+        for album in albums:
+            try:
+                os.unlink(self.marker(album))
+                self.evict(album)
+            except FileNotFoundError:  # not cached
+                pass
+
+    def path(self, album, mtime, size=None, ext='.jpg'):
+        '''
+        returns cache path of album cover image extracted from a track
+        with mtime (ns), at size (None: full size), named to keep the
+        images of an album together (see evict)
+        '''
+        name = '%s-%d-%s%s' % (digest(album), mtime, size or 'full', ext)
+
+        return os.path.join(self.root, name[:2], name)
+
+    def prewarm(self, albums, locate=None, pause=0):
+        '''
+        returns progress of filling the cache with the cover images of
+        albums (in order) ahead of demand (see warm), using locations
+        from locate(album) if given (see MooAlbums.cover), and sleeping
+        pause seconds after each album to yield to requests. Progress
+        is also kept in self.progress while running.
+        '''
+        albums = list(albums)
+        start = time.time()
+        progress = {
+            'albums': len(albums),
+            'done': 0,
+            'rate': 0,
+            'seconds': 0,
+            'warmed': 0}
+
+        self.progress = progress
+
+        for album in albums:
+            location = locate(album) if locate else None
+
+            try:
+                if location is not False and self.warm(album, location):
+                    progress['warmed'] += 1
+            except (OSError, ValueError) as err:
+                logging.warning('Cannot prewarm %s: %s', album, err)
+
+            progress['done'] += 1
+            progress['seconds'] = round(time.time() - start, 3)
+            progress['rate'] = round(
+                progress['done'] / max(progress['seconds'], 0.001), 1)
+
+            if pause:
+                time.sleep(pause)
+
+        return progress
+
+    def stats(self):
+        '''
+        returns dict of cache statistics
+        '''
+        return {
+            'extracted': self.extracted,
+            'hits': self.hits,
+            'misses': self.misses,
+            'prewarm': self.progress,
+            'resize': Image is not None,
+            'sizes': self.sizes}
+
+    def warm(self, album, location=None):
+        '''
+        extract the cover image of album (from its location in a track,
+        if known) and resize it to each standard size, unless cached
+        (or served from the track), returns True if it was extracted
+        '''
+        sizes = self.sizes if Image is not None else list()
+
+        if location and not sizes:
+            return False  # served from the track at full size
+
+        if not sizes:
+            location = None  # full size: copy it
+
+        found = self.lookup(album, sizes[0] if sizes else None, location)
+        extracted = False
+
+        if found is None:
+            extracted = self.extract(album, location)
+            found = extracted or None
+
+        if found:
+            for size in sizes:
+                self.lookup(album, size, location)
+
+        return extracted
+
+
+def digest(value):
+    '''
+    returns hex digest of value (for cache file names)
+    '''
+    return hashlib.sha1(
+        value.encode('utf-8', 'surrogateescape')).hexdigest()
+
+
+def resize(src, dst, size):
+    '''
+    write image src scaled down to fit size (square) to dst as JPEG
+    '''
+    with Image.open(src) as image:
+        image.thumbnail((size, size))
+
+        if image.mode not in ('L', 'RGB'):
+            image = image.convert('RGB')
+
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(dst))
+
+        with os.fdopen(fd, 'wb') as _:
+            image.save(_, 'JPEG', quality=85)
+
+    os.replace(tmp, dst)
+
+
+def write(path, data):
+    '''
+    write data to path (replacing it when complete)
+    '''
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+
+    with os.fdopen(fd, 'wb') as _:
+        _.write(data)
+
+    os.replace(tmp, path)
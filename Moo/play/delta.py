@@ -0,0 +1,196 @@
+'''
+MooDelta class
+'''
+
+from bisect import bisect_left
+
+from Moo.play.terms import FIELDS, MooTerms, tokens
+
+
+class MooDelta:
+
+    '''
+    returns an instance of MooDelta, the search terms of a search index
+    (MooTerms or MooIndex) with the entries of some albums removed and
+    the entries of albums added or modified since kept in a small
+    MooTerms, merged at query time so that updates need not write the
+    whole index again. Track ids of added entries follow those of the
+    index.
+    '''
+
+    def __init__(self, terms, base='', albums=None, removed=(),
+                 entries=()):
+        self.added = MooTerms(list(entries))
+        self.albums = albums  # see album_tids()
+        self.base = base
+        self.offset = len(terms.results)
+        self.removed = frozenset(removed)
+        self.terms = terms
+        self.keys = [self.added_keys(x) for x in self.added.results]
+        self.results = MooDeltaResults(self)
+
+    def added_keys(self, entry):
+        '''
+        returns list of keys of the values of an added entry (see key),
+        the key of an equal value in the index if it has one
+        '''
+        out = [entry[0]]
+
+        for field in FIELDS:
+            value = entry[field]
+            out.append(value)
+
+            if not isinstance(value, str):
+                continue
+
+            keys, tids = self.terms.names(field)
+            ind = bisect_left(keys, value.lower())
+
+            if ind < len(keys) and keys[ind] == value.lower():
+                tid = tids[ind]
+
+                if self.terms.results[tid][field] == value:
+                    out[field] = self.terms.key(tid, field)
+
+        return out
+
+    def album_tids(self):
+        '''
+        returns dict of lists of track ids in the index by album path
+        (relative to base), built on first use
+        '''
+        if self.albums is None:
+            groups = dict()
+
+            for tid in range(self.offset):
+                groups.setdefault(self.terms.key(tid, 0), list()).append(tid)
+
+            self.albums = {
+                self.relative(self.terms.results[x[0]][0]): x
+                for x in groups.values()}
+
+        return self.albums
+
+    def change(self, stale, entries):
+        '''
+        returns a new MooDelta without the entries of albums in stale
+        (paths relative to base) and with entries added
+        '''
+        albums = self.album_tids()
+        removed = set(self.removed)
+
+        for path in stale:
+            removed.update(albums.get(path, ()))
+
+        kept = [x for x in self.added.results
+                if self.relative(x[0]) not in stale]
+
+        return MooDelta(self.terms, self.base, albums, removed,
+                        kept + list(entries))
+
+    def changes(self):
+        '''
+        returns number of entries removed from or added to the index
+        '''
+        return len(self.removed) + len(self.added.results)
+
+    def key(self, tid, col):
+        '''
+        returns a key equal for track ids with the same value at col of
+        their search index entries
+        '''
+        if tid < self.offset:
+            return self.terms.key(tid, col)
+
+        return self.keys[tid - self.offset][col]
+
+    def ranks(self, field, terms, fuzzy=False):
+        '''
+        returns dict of scores by track id matching terms in field (see
+        MooTerms.ranks)
+        '''
+        out = {tid: score for tid, score
+               in self.terms.ranks(field, terms, fuzzy).items()
+               if tid not in self.removed}
+
+        for tid, score in self.added.ranks(field, terms, fuzzy).items():
+            out[self.offset + tid] = score
+
+        return out
+
+    def relative(self, path):
+        '''
+        returns path relative to base
+        '''
+        return path.replace(self.base, '') if self.base else path
+
+    def suggest(self, field, prefix, limit=10):
+        '''
+        returns list of up to limit track ids with distinct values of
+        field starting with prefix (see MooTerms.suggest)
+        '''
+        found = dict()
+
+        for tid in self.terms.suggest(field, prefix, limit):
+            if tid in self.removed:
+                tid = self.survivor(field, tid)
+
+            if tid is not None:
+                found[self.terms.results[tid][field].lower()] = tid
+
+        for tid in self.added.suggest(field, prefix, limit):
+            value = self.added.results[tid][field].lower()
+            found.setdefault(value, self.offset + tid)
+
+        return [found[x] for x in sorted(found)[:limit]]
+
+    def survivor(self, field, tid):
+        '''
+        returns a track id in the index (not removed) with the value of
+        field at removed track id tid (ignoring case), or None
+        '''
+        value = self.terms.results[tid][field].lower()
+        query = tokens(value)
+
+        if not query:
+            return None
+
+        for other in self.terms.exact(field, query[0]):
+            if (other not in self.removed
+                    and self.terms.results[other][field].lower() == value):
+                return other
+
+        return None
+
+
+class MooDeltaResults:
+
+    '''
+    sequence of search index entries of a MooDelta, read on access by
+    track id, iterating (and counting) only those not removed
+    '''
+
+    def __init__(self, delta):
+        self.terms = delta
+
+    def __getitem__(self, tid):
+        delta = self.terms
+
+        if tid < delta.offset:
+            return delta.terms.results[tid]
+
+        return delta.added.results[tid - delta.offset]
+
+    def __iter__(self):
+        delta = self.terms
+
+        for tid in range(delta.offset):
+            if tid not in delta.removed:
+                yield delta.terms.results[tid]
+
+        yield from delta.added.results
+
+    def __len__(self):
+        delta = self.terms
+
+        return delta.offset - len(delta.removed) + len(delta.added.results)
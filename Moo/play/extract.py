@@ -0,0 +1,46 @@
+'''
+Moo Extraction
+~~~~~~~~~~~~~~
+
+Parallel (process pool) tag extraction
+'''
+
+import logging
+import multiprocessing
+import os
+
+from concurrent.futures import ProcessPoolExecutor
+
+
+# not fork: pools are started from threads that may hold locks
+START = ('forkserver'
+         if 'forkserver' in multiprocessing.get_all_start_methods()
+         else 'spawn')
+
+
+def extract(func, items, *iterables, workers=None, chunksize=None):
+    '''
+    yields func(item, ...) for each of items (and any iterables, like
+    map), in order, from a pool of worker processes (default: one per
+    CPU), or serially if workers is 1 or there are too few items to be
+    worth a pool
+    '''
+    items = list(items)
+    workers = workers or os.cpu_count() or 1
+
+    if workers < 2 or len(items) < 2:
+        yield from map(func, items, *iterables)
+        return
+
+    workers = min(workers, len(items))
+
+    if not chunksize:
+        chunksize = max(1, min(64, len(items) // (workers * 4)))
+
+    logging.info('Extracting %d items (%d workers, chunksize %d)',
+                 len(items), workers, chunksize)
+
+    context = multiprocessing.get_context(START)
+
+    with ProcessPoolExecutor(workers, mp_context=context) as pool:
+        yield from pool.map(func, items, *iterables, chunksize=chunksize)
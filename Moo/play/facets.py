@@ -0,0 +1,209 @@
+'''
+MooFacets class
+'''
+
+import threading
+
+from .cache import MooCache
+
+
+FACETS = ('artist', 'encoding', 'genre', 'year')
+
+
+class MooFacets:
+
+    '''
+    returns an instance of MooFacets, inverted indexes from normalized
+    (lower case) FACETS values to album paths, with an index of value
+    trigrams for substring lookups, and album counts by value for the
+    whole library (and memoized for subsets), kept up to date with
+    update()
+    '''
+
+    def __init__(self, albums, memo=256):
+        self.albums = albums
+        self.grams = {x: dict() for x in FACETS}
+        self.lock = threading.Lock()
+        self.memo = MooCache(memo)  # subset counts by query
+        self.owned = dict()  # sets copied (or made) by this update
+        self.paths = {x: dict() for x in FACETS}
+        self.seq = dict()  # album order, as in albums
+        self.size = 0
+        self.totals = {x: dict() for x in FACETS}
+        self.values = {x: dict() for x in FACETS}  # value by path
+        self.version = 0
+
+        with self.lock:
+            for path in albums:
+                self.add(path, albums[path])
+
+            self.owned = dict()
+
+    def add(self, path, record):
+        '''
+        add album record at path to the indexes
+        '''
+        if path not in self.seq:
+            self.seq[path] = self.size
+            self.size += 1
+
+        for facet in FACETS:
+            raw = record.get(facet) or 'None'
+            totals = self.totals[facet]
+            totals[raw] = totals.get(raw, 0) + 1
+            self.values[facet][path] = raw
+
+            value = normalize(record.get(facet))
+
+            if value not in self.paths[facet]:
+                for gram in trigrams(value):
+                    self.mutable(self.grams[facet], gram).add(value)
+
+            self.mutable(self.paths[facet], value).add(path)
+
+    def counts(self, facet, paths=None, query=None):
+        '''
+        returns dict of album counts by facet value ('None' if empty)
+        for all albums, or for album paths, memoized by query (e.g.
+        the facet and value paths were matched by) until update()
+        '''
+        if paths is None or len(paths) == len(self.seq):  # all albums
+            return dict(self.totals[facet])
+
+        if query:
+            key = (query, facet)
+            counts = self.memo.get(key, self.version)
+
+            if counts is not None:
+                return counts
+
+        counts = dict()
+        values = self.values[facet]
+
+        for path in paths:
+            raw = values.get(path)
+
+            if raw:
+                counts[raw] = counts.get(raw, 0) + 1
+
+        if query:
+            self.memo.put(key, self.version, counts)
+
+        return counts
+
+    def exact(self, facet, value):
+        '''
+        returns set of album paths where facet is value (ignoring case)
+        '''
+        return self.paths[facet].get(normalize(value), set())
+
+    def match(self, facet, value):
+        '''
+        returns list of album paths (in album order) where facet
+        contains value (ignoring case), or is empty if value is 'None'
+        '''
+        query = normalize(value)
+        grams = [self.grams[facet].get(x) for x in trigrams(query)]
+
+        if not grams:  # too short for trigrams
+            values = list(self.paths[facet])
+        elif all(grams):
+            values = set.intersection(*grams)
+        else:
+            values = list()
+
+        values = [x for x in values if query in x]
+
+        if value == 'None' and '' in self.paths[facet]:
+            values.append('')
+
+        paths = set()
+
+        for item in values:
+            paths.update(self.paths[facet].get(item, ()))
+
+        return sorted(paths, key=lambda x: self.seq.get(x, self.size))
+
+    def remove(self, path, record, keep=False):
+        '''
+        remove album record at path from the indexes, keeping its place
+        in album order if keep is True
+        '''
+        if not keep:
+            self.seq.pop(path, None)
+
+        for facet in FACETS:
+            raw = record.get(facet) or 'None'
+            totals = self.totals[facet]
+            totals[raw] = totals.get(raw, 0) - 1
+
+            if totals[raw] < 1:
+                del totals[raw]
+
+            if not keep:
+                self.values[facet].pop(path, None)
+
+            value = normalize(record.get(facet))
+            paths = self.mutable(self.paths[facet], value)
+            paths.discard(path)
+
+            if paths:
+                continue
+
+            self.paths[facet].pop(value, None)
+
+            for gram in trigrams(value):
+                grams = self.mutable(self.grams[facet], gram)
+                grams.discard(value)
+
+                if not grams:
+                    self.grams[facet].pop(gram, None)
+
+    def update(self, albums, records, removed=()):
+        '''
+        update indexes from (old) albums to the (new) albums after
+        adding or modifying album records and removing album paths
+        '''
+        removed = set(removed)
+
+        with self.lock:
+            for path in removed:
+                if path in self.albums:
+                    self.remove(path, self.albums[path])
+
+            for path in records:
+                if path in self.albums and path not in removed:
+                    self.remove(path, self.albums[path], keep=True)
+                self.add(path, records[path])
+
+            self.albums = albums
+            self.owned = dict()
+            self.version += 1
+
+    def mutable(self, table, key):
+        '''
+        returns the set at table[key] to change in place, copied first
+        (once per update) if readers may be using it
+        '''
+        items = table.get(key)
+
+        if id(items) not in self.owned:
+            items = set(items or ())
+            self.owned[id(items)] = items
+            table[key] = items
+
+        return items
+
+
+def normalize(value):
+    '''
+    returns facet value normalized for lookups
+    '''
+    return (value or '').lower()
+
+
+def trigrams(value):
+    '''
+    returns set of three-character substrings of value
+    '''
+    return {value[i:i + 3] for i in range(len(value) - 2)}
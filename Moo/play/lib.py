@@ -3,8 +3,8 @@ Methods supporting Moo.play
 '''
 
 import logging
+import mmap
 import os
-import random
 
 from collections import Counter
 from io import BytesIO
@@ -95,24 +95,14 @@ def album_info(track, metadata):
     return out
 
 
-def base_link(base):
+def apic_data(apic):
     '''
-    makes symbolic link to BASE in Moo/play/static
+    returns (image data, mimetype) tuple from APIC (or MP4Cover)
     '''
-    dst = os.path.join(os.getcwd(), 'Moo', 'play', 'static', 'Moo')
-
-    if not os.path.exists(base):
-        raise ValueError(f"BASE not found: {base}")
-
-    logging.info('Linking BASE to static/Moo')
-    logging.info('> os.symlink(%s, %s)', base, dst)
-
-    if os.path.exists(dst):
-        if not os.path.islink(dst):
-            raise ValueError(f'Directory exists: {dst}')
-        os.unlink(dst)
-
-    os.symlink(base, dst, target_is_directory=True)
+    try:
+        return apic.data, apic.mime
+    except AttributeError:  # try MP4Cover (list of strings)
+        return apic[0], 'image/jpeg'
 
 
 def base_write(base):
@@ -123,9 +113,10 @@ def base_write(base):
         _.write(base)
 
 
-def control(base, index, metadata, track_ind):
+def control(metadata, track_ind):
     '''
-    returns next, prev, and random track numbers as dict
+    returns next and prev track numbers as dict (random picks are made
+    by the client, so pages stay cacheable)
     '''
     ntracks = len(metadata)
     _next = track_ind + 2
@@ -137,14 +128,9 @@ def control(base, index, metadata, track_ind):
     if prev < 1:
         prev = 0
 
-    ind = random.choice(range(len(index)))
-    alkey = str(index[ind]).replace(base, '')
-
     return {
         'next': _next,
         'prev': prev,
-        'ralbum': alkey,
-        'rtrack': random.choice(range(ntracks)) + 1,
         'track_num': track_ind + 1}
 
 
@@ -171,18 +157,11 @@ def cover(fpath, tpath=None):
     '''
     logging.info('lib.cover fpath = %s', fpath)
 
-    apic = get_apic(fpath, tpath)
-
-    try:
-        data = apic.data
-        mtype = apic.mime
-    except AttributeError:  # try MP4Cover (list of strings)
-        data = apic[0]
-        mtype = 'image/jpeg'
+    data, mtype = apic_data(get_apic(fpath, tpath))
 
     return send_file(
         BytesIO(data),
-        attachment_filename='apic',
+        download_name='apic',
         mimetype=mtype)
 
 
@@ -191,29 +170,13 @@ def get_apic(fpath, tpath=None):
     returns track image if tpath, else first attached picture
     (APIC) found in tracks
      '''
-    def img(track_path):
-        try:
-            meta = mutagen.File(track_path)
-
-            for tag in dict(meta):
-                if tag.startswith('APIC') or tag.startswith('covr'):
-                    return meta[tag]
-
-        except AttributeError:
-            return None  # not a media file
-
-        except (mutagen.id3.ID3NoHeaderError, mutagen.MutagenError):
-            return None  # no ID3 headers
-
-        return None
-
     if tpath:
-        track_img = img(tpath)
+        track_img = track_apic(tpath)
         if track_img:
             return track_img
 
     for track in Path(fpath).iterdir():
-        track_img = img(str(track))
+        track_img = track_apic(str(track))
         if track_img:
             return track_img
 
@@ -279,6 +242,19 @@ def personnel(metadata):
     return list(_)
 
 
+def picture(fpath, offset, length):
+    '''
+    returns length bytes at offset in file fpath (an attached picture
+    located by reader.picture), copied once from a read-only map
+    '''
+    with open(fpath, 'rb') as _:
+        with mmap.mmap(_.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            if offset + length > len(view):
+                raise ValueError('Truncated picture in %s' % fpath)
+
+            return view[offset:offset + length]
+
+
 def prefixed(titles):
     '''
     returns (prefix) nested dict from list of titles, which can vastly
@@ -381,3 +357,27 @@ def tags(base, alkey, track_fname):
             return _tags
 
     return None
+
+
+def track_apic(track_path):
+    '''
+    returns first attached picture (APIC, covr, or FLAC picture) in
+    track, or None
+    '''
+    try:
+        meta = mutagen.File(track_path)
+
+        if getattr(meta, 'pictures', None):
+            return meta.pictures[0]
+
+        for tag in dict(meta):
+            if tag.startswith('APIC') or tag.startswith('covr'):
+                return meta[tag]
+
+    except (AttributeError, TypeError):
+        return None  # not a media file
+
+    except (mutagen.id3.ID3NoHeaderError, mutagen.MutagenError):
+        return None  # no ID3 headers
+
+    return None
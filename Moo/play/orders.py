@@ -0,0 +1,90 @@
+'''
+MooOrders class
+'''
+
+import threading
+
+from bisect import bisect_left, insort
+
+
+SORT_KEYS = ('album', 'artist', 'genre', 'mtime', 'year')
+
+WALK = 8  # walk a stored order for subsets larger than 1/WALK albums
+
+
+class MooOrders:
+
+    '''
+    returns an instance of MooOrders, sorted lists of (value, path)
+    tuples for each of SORT_KEYS over albums, kept up to date with
+    update(), from which (subsets of) albums are sorted by walking
+    '''
+
+    def __init__(self, albums):
+        self.albums = albums
+        self.entries = dict()
+        self.lock = threading.Lock()
+        self.memo = dict()
+
+        for key in SORT_KEYS:
+            self.entries[key] = sorted(
+                (albums[x].get(key), x) for x in albums)
+
+    def sort(self, key, albums, reverse=False, nones=None):
+        '''
+        returns list of paths in albums (dict of records by path, at
+        least as current as ours) sorted by (key value, path) like
+        sorted() of tuples, with paths where the value is 'None' last,
+        still sorted (nones='sorted') or in albums order (nones='given')
+        '''
+        if len(albums) * WALK > len(self.albums):
+            entries = self.entries[key]
+
+            if reverse:
+                entries = reversed(entries)
+
+            if albums is self.albums:
+                items = list(entries)
+            else:
+                items = [x for x in entries if x[1] in albums]
+        else:
+            items = sorted(((albums[x].get(key), x) for x in albums),
+                           reverse=reverse)
+
+        if not nones:
+            return [x[1] for x in items]
+
+        out = [x[1] for x in items if x[0] != 'None']
+
+        if nones == 'given':
+            out.extend(x for x in albums if albums[x].get(key) == 'None')
+        else:
+            out.extend(x[1] for x in items if x[0] == 'None')
+
+        return out
+
+    def update(self, albums, records, removed=()):
+        '''
+        update orders from (old) albums to the (new) albums after
+        adding or modifying album records and removing album paths
+        '''
+        stale = [x for x in set(removed).union(records) if x in self.albums]
+
+        with self.lock:
+            for key in SORT_KEYS:
+                entries = list(self.entries[key])  # copy, readers walk
+
+                for path in stale:
+                    entry = (self.albums[path].get(key), path)
+                    ind = bisect_left(entries, entry)
+
+                    if ind < len(entries) and entries[ind] == entry:
+                        del entries[ind]
+
+                for path in records:
+                    insort(entries, (records[path].get(key), path))
+
+                self.entries[key] = entries
+
+            self.albums = albums
+            self.memo = dict()
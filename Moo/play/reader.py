@@ -0,0 +1,673 @@
+'''
+Moo Tag Reader
+~~~~~~~~~~~~~~
+
+Header-only tag reader for MP3 (ID3v2.3/2.4), FLAC (Vorbis comments)
+and MP4 (ilst) files. Reads text frames only, seeking past pictures
+and everything else, and returns None for anything unusual so that
+callers can fall back to mutagen. Also locates attached pictures
+(without reading them) so they can be served from the file as is.
+'''
+
+import os
+import re
+import struct
+
+from itertools import zip_longest
+
+from mutagen._constants import GENRES
+
+
+GENRE_CODES = {'CR': 'Cover', 'RX': 'Remix'}
+
+GENRE_REFS = re.compile(r'((?:\((?P<id>[0-9]+|RX|CR)\))*)(?P<str>.+)?')
+
+ID3_FRAMES = {
+    'TALB', 'TCON', 'TDAT', 'TDRC', 'TIME', 'TIT2', 'TPE1', 'TPE2',
+    'TPOS', 'TRCK', 'TYER',
+}
+
+ID3V1_FRAMES = ('TALB', 'TCON', 'TDRC', 'TIT2', 'TPE1', 'TRCK')
+
+MP4_CONTAINERS = {b'moov', b'udta', b'meta', b'ilst'}
+
+MP4_TEXT = {
+    b'\xa9ART', b'\xa9alb', b'\xa9day', b'\xa9gen', b'\xa9nam',
+    b'\xa9wrt', b'aART',
+}
+
+PICTURE_TYPES = {13: 'image/jpeg', 14: 'image/png'}  # MP4 data types
+
+TEXT_ENCODINGS = ('latin-1', 'utf-16', 'utf-16-be', 'utf-8')
+
+TIMESTAMP = re.compile(r'[-T:/.]|\s+')
+
+
+class VorbisDict(dict):
+
+    '''
+    dict of Vorbis comments with case-insensitive (lowercase) keys,
+    like mutagen.flac.VCFLACDict
+    '''
+
+    def __contains__(self, key):
+        return super().__contains__(key.lower())
+
+    def __getitem__(self, key):
+        return super().__getitem__(key.lower())
+
+    def get(self, key, default=None):
+        return super().get(key.lower(), default)
+
+
+def read(fpath):
+    '''
+    returns (encoding, tags) tuple from audio file fpath, where tags
+    is a dict of lists of values keyed like mutagen tags (None for tags
+    that were skipped), or None if fpath is not a (plain) MP3, FLAC, or
+    MP4 file
+    '''
+    with open(fpath, 'rb') as _:
+        head = _.read(10)
+
+        try:
+            if head[:4] == b'fLaC':
+                _.seek(4)
+                return read_flac(_)
+
+            if head[:3] == b'ID3' and str(fpath).lower().endswith('.mp3'):
+                return read_id3(_, head)
+
+            if head[4:8] == b'ftyp':
+                _.seek(0)
+                return read_mp4(_)
+
+        except (IndexError, struct.error):
+            return None  # truncated or corrupt, let mutagen decide
+
+    return None
+
+
+def read_flac(fobj):
+    '''
+    returns ('FLAC', tags) from FLAC metadata blocks in fobj
+    '''
+    tags = VorbisDict()
+    last = False
+
+    while not last:
+        header = fobj.read(4)
+
+        if len(header) < 4:
+            return None
+
+        last = bool(header[0] & 0x80)
+        btype = header[0] & 0x7f
+        size = int.from_bytes(header[1:], 'big')
+
+        if btype != 4:  # VORBIS_COMMENT
+            fobj.seek(size, os.SEEK_CUR)
+            continue
+
+        data = fobj.read(size)
+        vlen = struct.unpack_from('<I', data)[0]
+        pos = 4 + vlen
+        count = struct.unpack_from('<I', data, pos)[0]
+        pos += 4
+
+        for _ in range(count):
+            clen = struct.unpack_from('<I', data, pos)[0]
+            pos += 4
+            comment = data[pos:pos + clen].decode('utf-8', 'replace')
+            pos += clen
+
+            if '=' in comment:
+                key, val = comment.split('=', 1)
+                tags.setdefault(key.lower(), list()).append(val)
+
+    return 'FLAC', tags
+
+
+def read_id3(fobj, head):
+    '''
+    returns ('MP3', tags) from ID3v2.3 or ID3v2.4 text frames in fobj,
+    seeking past all other frames, or None for unsynchronised,
+    compressed, or encrypted tags, or when an ID3v1 tag might add
+    frames (as mutagen would)
+    '''
+    found = id3_tag(fobj, head)
+
+    if found is None:
+        return None
+
+    major, frames = found
+    tags = dict()
+
+    for name, fflags, pos, size in frames:
+        if name not in ID3_FRAMES:
+            tags.setdefault(name, None)  # not read
+            continue
+
+        skip = id3_skip(major, fflags)
+
+        if skip is None:
+            return None
+
+        fobj.seek(pos + skip)
+        text = id3_text(fobj.read(size - skip))
+
+        if text is None:
+            return None
+
+        tags[name] = text
+
+    if not all(x in tags for x in ID3V1_FRAMES):
+        fobj.seek(-128, os.SEEK_END)
+        if fobj.read(3) == b'TAG':
+            return None
+
+    id3_update(tags)
+
+    return 'MP3', tags
+
+
+def id3_frames(fobj, pos, end, synchsafe_sizes):
+    '''
+    returns list of (frame ID, flags, offset, size) tuples of the frames
+    of an ID3v2 tag in fobj from pos to end, reading only their headers,
+    or None if the frames cannot be read (without mutagen)
+    '''
+    frames = list()
+
+    while pos + 10 <= end:
+        fobj.seek(pos)
+        header = fobj.read(10)
+        fid = header[:4]
+
+        if fid[0] == 0:  # padding
+            break
+
+        if not all(48 <= x <= 57 or 65 <= x <= 90 for x in fid):
+            return None  # not A-Z, 0-9
+
+        if synchsafe_sizes:
+            size = synchsafe(header[4:8])
+        else:
+            size = struct.unpack('>I', header[4:8])[0]
+
+        pos += 10
+
+        if pos + size > end:
+            return None
+
+        frames.append((fid.decode('ascii'), header[9], pos, size))
+        pos += size
+
+    return frames
+
+
+def id3_genres(values):
+    '''
+    returns list of genres from TCON values, translating ID3v1 genre
+    numbers and "(17)Rock" style references like mutagen.id3.TCON
+    '''
+    genres = list()
+
+    for value in values:
+        if value.isdecimal() and int(value) < 256:
+            try:
+                genres.append(GENRES[int(value)])
+            except IndexError:
+                genres.append('Unknown')
+        elif value in GENRE_CODES:
+            genres.append(GENRE_CODES[value])
+        elif value:
+            found = list()
+            refs, _, name = GENRE_REFS.match(value).groups()
+
+            if refs:
+                for ref in refs[1:-1].split(')('):
+                    if ref.isdigit() and int(ref) < len(GENRES):
+                        found.append(GENRES[int(ref)])
+                    else:
+                        found.append(GENRE_CODES.get(ref, 'Unknown'))
+
+            if name:
+                if name.startswith('(('):  # escaped parenthesis
+                    name = name[1:]
+                if name not in found:
+                    found.append(name)
+
+            genres.extend(found)
+
+    return genres
+
+
+def id3_skip(major, fflags):
+    '''
+    returns number of bytes to skip before the data of a frame with
+    flags fflags, or None for compressed, encrypted, or unsynchronised
+    frames
+    '''
+    if major == 4:
+        if fflags & 0x0e:  # compression, encryption, unsync
+            return None
+        return (1 if fflags & 0x40 else 0) + (4 if fflags & 0x01 else 0)
+
+    if fflags & 0xe0:  # compression, encryption, grouping
+        return None
+
+    return 0
+
+
+def id3_tag(fobj, head):
+    '''
+    returns (major version, frames) tuple of the ID3v2.3 or ID3v2.4 tag
+    at the start of fobj (see id3_frames), or None if the tag is
+    unsynchronised or cannot be read (without mutagen)
+    '''
+    major = head[3]
+    flags = head[5]
+
+    if major not in (3, 4) or flags & 0x80:
+        return None
+
+    end = 10 + synchsafe(head[6:10])
+
+    if fobj.seek(0, os.SEEK_END) < end:
+        return None
+
+    start = 10
+
+    if flags & 0x40:  # extended header
+        fobj.seek(10)
+        ext = fobj.read(4)
+
+        if major == 4:
+            start += synchsafe(ext)
+        else:
+            start += struct.unpack('>I', ext)[0] + 4
+
+    frames = id3_frames(fobj, start, end, major == 4)
+
+    if frames is None and major == 4:  # non-synchsafe frame sizes (iTunes)
+        frames = id3_frames(fobj, start, end, False)
+
+    if frames is None:
+        return None
+
+    return major, frames
+
+
+def id3_text(frame):
+    '''
+    returns list of values from ID3 text frame data
+    '''
+    if not frame or frame[0] > 3:
+        return None
+
+    try:
+        text = frame[1:].decode(TEXT_ENCODINGS[frame[0]])
+    except UnicodeDecodeError:
+        return None
+
+    return [x for x in text.rstrip('\x00').split('\x00')]
+
+
+def id3_timestamp(value):
+    '''
+    returns ID3v2.4 timestamp text normalized like mutagen (e.g.
+    "1999/05/12" as "1999-05-12")
+    '''
+    parts = TIMESTAMP.split(value + ':::::')[:6]
+    pieces = list()
+
+    for ind, part in enumerate(parts):
+        try:
+            num = int(part)
+        except ValueError:
+            break
+
+        pieces.append(('%04d' if ind == 0 else '%02d') % num
+                      + '-- ::x'[ind])
+
+    return ''.join(pieces)[:-1]
+
+
+def id3_update(tags):
+    '''
+    update ID3 text frames in tags in place like mutagen does when it
+    loads a tag (see mutagen.id3.ID3Tags.update_to_v24): translate
+    genres, and merge TYER, TDAT, and TIME into TDRC
+    '''
+    if tags.get('TCON') is not None:
+        tags['TCON'] = id3_genres(tags['TCON'])
+
+    stamps = list()
+    old = [tags.pop(x, None) or list() for x in ('TYER', 'TDAT', 'TIME')]
+
+    for year, date, time in zip_longest(*old, fillvalue=''):
+        ymatch = re.match(r'([0-9]{4})(-[0-9]{2}-[0-9]{2})?\Z', year)
+        dmatch = re.match(r'([0-9]{2})([0-9]{2})\Z', date)
+        tmatch = re.match(r'([0-9]{2})([0-9]{2})\Z', time)
+
+        if not ymatch:
+            continue
+
+        stamp, month_day = ymatch.groups()
+
+        if dmatch:
+            month_day = '-%s-%s' % dmatch.groups()[::-1]
+
+        if month_day:
+            stamp += month_day
+
+            if tmatch:
+                stamp += 'T%s:%s:00' % tmatch.groups()
+
+        stamps.append(stamp)
+
+    if stamps:
+        tags.setdefault('TDRC', stamps)
+
+    if tags.get('TDRC') is not None:
+        tags['TDRC'] = [id3_timestamp(x) for x in tags['TDRC']]
+
+
+def read_mp4(fobj):
+    '''
+    returns ('MP4', tags) from MP4 ilst text, track, disc, and genre
+    atoms in fobj
+    '''
+    tags = dict()
+    end = fobj.seek(0, os.SEEK_END)
+    fobj.seek(0)
+
+    if not mp4_atoms(fobj, end, tags):
+        return None
+
+    return 'MP4', tags
+
+
+def mp4_atoms(fobj, end, tags, parent=None):
+    '''
+    reads atoms from fobj until end, descending into containers on the
+    way to ilst and adding ilst items to tags. Returns False on error.
+    '''
+    while fobj.tell() + 8 <= end:
+        start = fobj.tell()
+        size, name = struct.unpack('>I4s', fobj.read(8))
+
+        if size == 1:
+            size = struct.unpack('>Q', fobj.read(8))[0]
+        elif size == 0:
+            size = end - start
+
+        if size < 8 or start + size > end:
+            return False
+
+        if parent == b'ilst':
+            if name in MP4_TEXT or name in (b'trkn', b'disk', b'gnre'):
+                data = fobj.read(size - (fobj.tell() - start))
+                if not mp4_item(name, data, tags):
+                    return False
+            else:
+                tags.setdefault(name.decode('latin-1'), None)  # not read
+        elif name in MP4_CONTAINERS:
+            if name == b'meta':
+                fobj.seek(4, os.SEEK_CUR)  # version, flags
+            if not mp4_atoms(fobj, start + size, tags, name):
+                return False
+
+        fobj.seek(start + size)
+
+    return True
+
+
+def mp4_item(name, data, tags):
+    '''
+    adds values of ilst item name from its data atoms to tags, like
+    mutagen.mp4.MP4Tags. Returns False on error.
+    '''
+    key = name.decode('latin-1')
+    values = list()
+    pos = 0
+
+    while pos + 16 <= len(data):
+        size, atom = struct.unpack_from('>I4s', data, pos)
+
+        if size < 16 or pos + size > len(data):
+            return False
+
+        if atom == b'data':
+            flags = int.from_bytes(data[pos + 9:pos + 12], 'big')
+            value = data[pos + 16:pos + size]
+
+            if name in (b'trkn', b'disk'):
+                values.append(struct.unpack('>2H', value[2:6]))
+            elif name == b'gnre':
+                if len(value) != 2:
+                    return False
+                try:
+                    values.append(GENRES[struct.unpack('>H', value)[0] - 1])
+                except IndexError:
+                    return False
+                key = '\xa9gen'
+            else:
+                if flags not in (0, 1):
+                    return False
+                try:
+                    values.append(value.decode('utf-8'))
+                except UnicodeDecodeError:
+                    return False
+
+        pos += size
+
+    tags.setdefault(key, list()).extend(values)
+
+    return True
+
+
+def picture(fpath):
+    '''
+    returns (offset, length, mimetype) tuple locating the image data
+    of the first attached picture in audio file fpath, False if it has
+    none, or None if fpath is not a (plain) MP3, FLAC, or MP4 file
+    '''
+    with open(fpath, 'rb') as _:
+        head = _.read(10)
+
+        try:
+            if head[:4] == b'fLaC':
+                _.seek(4)
+                return picture_flac(_)
+
+            if head[:3] == b'ID3' and str(fpath).lower().endswith('.mp3'):
+                return picture_id3(_, head)
+
+            if head[4:8] == b'ftyp':
+                end = _.seek(0, os.SEEK_END)
+                _.seek(0)
+                return picture_mp4(_, end)
+
+        except (IndexError, ValueError, struct.error):
+            return None  # truncated or corrupt, let mutagen decide
+
+    return None
+
+
+def picture_flac(fobj):
+    '''
+    returns (offset, length, mimetype) of the first FLAC picture block
+    data in fobj, reading only the fields before it, or False
+    '''
+    last = False
+
+    while not last:
+        header = fobj.read(4)
+
+        if len(header) < 4:
+            return None
+
+        last = bool(header[0] & 0x80)
+        btype = header[0] & 0x7f
+        size = int.from_bytes(header[1:], 'big')
+
+        if btype != 6:  # PICTURE
+            fobj.seek(size, os.SEEK_CUR)
+            continue
+
+        end = fobj.tell() + size
+        mlen = struct.unpack('>4xI', fobj.read(8))[0]
+        mime = fobj.read(mlen).decode('ascii')
+        dlen = struct.unpack('>I', fobj.read(4))[0]
+        fobj.seek(dlen + 16, os.SEEK_CUR)  # description, width, height...
+        length = struct.unpack('>I', fobj.read(4))[0]
+        start = fobj.tell()
+
+        if start + length > end:
+            return None
+
+        return start, length, mime or 'image/jpeg'
+
+    return False
+
+
+def picture_id3(fobj, head):
+    '''
+    returns (offset, length, mimetype) of the first ID3v2.3 or ID3v2.4
+    APIC frame image data in fobj, False if there is none, or None for
+    unsynchronised, compressed, or encrypted tags or frames
+    '''
+    found = id3_tag(fobj, head)
+
+    if found is None:
+        return None
+
+    major, frames = found
+
+    for name, fflags, pos, size in frames:
+        if name != 'APIC':
+            continue
+
+        skip = id3_skip(major, fflags)
+
+        if skip is None:
+            return None
+
+        return id3_apic(fobj, pos + skip, pos + size)
+
+    return False
+
+
+def id3_apic(fobj, pos, end):
+    '''
+    returns (offset, length, mimetype) of the image data of the APIC
+    frame data in fobj from pos to end, reading only as far as its
+    description, or None if it cannot be read (without mutagen)
+    '''
+    fobj.seek(pos)
+    data = b''
+
+    while pos + len(data) < end:
+        chunk = fobj.read(min(max(len(data), 64), end - pos - len(data)))
+
+        if not chunk:
+            break
+
+        data += chunk
+        found = id3_picture(data)
+
+        if found:
+            return pos + found[0], end - pos - found[0], found[1]
+
+    return None
+
+
+def id3_picture(data):
+    '''
+    returns (header length, mimetype) of APIC frame data, or None if
+    data ends before the image data
+    '''
+    encoding = data[0]
+    mend = data.find(b'\x00', 1)
+
+    if mend < 0:
+        return None
+
+    mime = data[1:mend].decode('latin-1').lower()
+    pos = mend + 2  # picture type
+
+    if encoding > 3 or mime == '-->':  # unknown, or a link
+        raise ValueError('Unsupported APIC frame')
+
+    if encoding in (1, 2):  # UTF-16, NUL NUL on an even offset
+        while pos + 2 <= len(data) and data[pos:pos + 2] != b'\x00\x00':
+            pos += 2
+
+        if pos + 2 > len(data):
+            return None
+
+        pos += 2
+    else:
+        pos = data.find(b'\x00', pos) + 1
+
+        if not pos:
+            return None
+
+    if '/' not in mime:  # ID3v2.2 style, PNG or JPG
+        mime = 'image/png' if mime == 'png' else 'image/jpeg'
+
+    return pos, mime
+
+
+def picture_mp4(fobj, end, parent=None):
+    '''
+    returns (offset, length, mimetype) of the first data atom of the
+    covr item in fobj, descending into containers on the way to ilst,
+    False if there is none, or None on error
+    '''
+    while fobj.tell() + 8 <= end:
+        start = fobj.tell()
+        size, name = struct.unpack('>I4s', fobj.read(8))
+
+        if size == 1:
+            size = struct.unpack('>Q', fobj.read(8))[0]
+        elif size == 0:
+            size = end - start
+
+        if size < 8 or start + size > end:
+            return None
+
+        if parent == b'ilst' and name == b'covr':
+            data = fobj.read(min(size - (fobj.tell() - start), 16))
+
+            if len(data) < 16 or data[4:8] != b'data':
+                return None
+
+            dsize, dtype = struct.unpack_from('>I4xI', data)
+            offset = fobj.tell()
+
+            if dsize < 16 or offset - 16 + dsize > start + size:
+                return None
+
+            return offset, dsize - 16, PICTURE_TYPES.get(
+                dtype & 0xffffff, 'image/jpeg')
+
+        if name in MP4_CONTAINERS and parent != b'ilst':
+            if name == b'meta':
+                fobj.seek(4, os.SEEK_CUR)  # version, flags
+            found = picture_mp4(fobj, start + size, name)
+            if found is not False:
+                return found
+
+        fobj.seek(start + size)
+
+    return False
+
+
+def synchsafe(data):
+    '''
+    returns integer from 4 bytes of 7-bit (synchsafe) data
+    '''
+    return (data[0] << 21) | (data[1] << 14) | (data[2] << 7) | data[3]
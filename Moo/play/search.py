@@ -2,15 +2,19 @@
 MooSearch class
 '''
 
+import heapq
 import json
 import logging
 import os
 
-from pathlib import Path
+from Moo.play import albums, sindex
+from Moo.play.catalog import album_signature
+from Moo.play.delta import MooDelta, MooDeltaResults
+from Moo.play.sindex import MooResults
+from Moo.play.terms import FIELDS, MooTerms
 
-import mutagen
 
-from Moo.play import albums
+WEIGHTS = {1: 3, 2: 2, 3: 1}  # score weights of album, artist, title
 
 
 class MooSearch:
@@ -19,42 +23,249 @@ class MooSearch:
     instance of MooSearch
     '''
 
+    terms = None
+
     def __init__(self, config):
         self.base = config.get('BASE')
+        self.changes = config.get('SINDEX_DELTA') or 0
         self.indexfile = config.get('SINDEX')
-        self.index = MooSearch.load_search(self.indexfile)
+        self.jsonfile = config.get('SINDEX_JSON')
+        self.index = self.load_index()
+        self.token_index()
 
-    def find(self, terms):
+    def find(self, terms, limit=None, offset=0):
         '''
-        returns list of results matching terms given sindex (search index)
+        returns (albums, artists, tracks, totals) tuple of results
+        matching terms in the search index, where every word in terms
+        starts a word in the album, artist, or track title (and terms
+        of several words appear together), or else within a few typos,
+        ranked by score (see MooTerms.ranks) and paged by offset and
+        limit, with the number of results of each kind in totals
         '''
         alb = dict()
         art = dict()
         trk = list()
+        totals = {'albums': 0, 'artists': 0, 'tracks': 0}
 
         if not terms or not self.index:
-            return alb, art, trk
+            return alb, art, trk, totals
+
+        index = self.token_index()
+        scores = {x: index.ranks(x, terms) for x in WEIGHTS}
+
+        if not any(scores.values()):  # allow typos, see MooTerms.similar
+            scores = {x: index.ranks(x, terms, True) for x in WEIGHTS}
+
+        def score(tid):
+            return sum(WEIGHTS[x] * scores[x].get(tid, 0) for x in WEIGHTS)
+
+        albs = best(scores[1], score, lambda x: index.key(x, 0))
+        arts = best(scores[2], score, lambda x: index.key(x, 2))
+
+        for tid in top(albs, offset, limit):
+            entry = self.relative(index.results[tid])
+            alb[entry[0]] = entry
+
+        for tid in top(arts, offset, limit):
+            entry = self.relative(index.results[tid])
+            art[entry[2]] = entry
+
+        for tid in top({x: score(x) for x in scores[3]}, offset, limit):
+            trk.append(self.relative(index.results[tid]))
+
+        totals['albums'] = len(albs)
+        totals['artists'] = len(arts)
+        totals['tracks'] = len(scores[3])
+
+        return alb, art, trk, totals
+
+    def relative(self, entry):
+        '''
+        returns copy of search index entry with path relative to BASE
+        '''
+        entry = list(entry)
+        entry[0] = entry[0].replace(self.base, '')
+
+        return entry
+
+    def suggest(self, prefix, limit=10):
+        '''
+        returns dict of up to limit album, artist, and track entries
+        with distinct album, artist, and title values (respectively)
+        starting with prefix (ignoring case), in value order
+        '''
+        out = {'albums': list(), 'artists': list(), 'tracks': list()}
+
+        if not prefix or not self.index:
+            return out
+
+        index = self.token_index()
+
+        for field, kind in zip(FIELDS, out):
+            for tid in index.suggest(field, prefix, limit):
+                out[kind].append(self.relative(index.results[tid]))
+
+        return out
+
+    def token_index(self):
+        '''
+        returns MooTerms for the current search index results, built
+        again whenever the results are replaced
+        '''
+        results = (self.index or dict()).get('results') or list()
+        terms = self.terms
+
+        if terms is None or terms.results is not results:
+            if isinstance(results, MooDeltaResults):  # updated in memory
+                self.terms = results.terms
+
+                logging.info('Search index changed by %d entries',
+                             self.terms.changes())
 
-        for entry in self.index.get('results'):
+                return self.terms
 
-            entry[0] = entry[0].replace(self.base, '')  # path
-            terms = terms.lower()
+            if isinstance(results, MooResults):  # mapped from file
+                terms = results.terms
+            else:
+                terms = MooTerms(results)
+            self.terms = terms
+
+            logging.info('Indexed %d search tokens',
+                         sum(len(x) for x in terms.tokens.values()))
+
+        return terms
+
+    def update(self, summary, files=None):
+        '''
+        update search index entries for albums added, modified, and
+        removed (from a MooAlbums.update summary, with the entries it
+        scanned if any) in memory (see MooDelta), and write the index
+        again once more than SINDEX_DELTA entries changed
+        '''
+        if not self.index:
+            return
 
-            if isinstance(entry[1], str) and terms in entry[1].lower():
-                alb[entry[0]] = entry
+        files = files or dict()
+        scanned = summary.get('entries') or dict()
+        fresh = summary['added'] + summary['modified']
+        stale = {x.replace(self.base, '')
+                 for x in summary['modified'] + summary['removed']}
+
+        entries = list()
+
+        for path in fresh:
+            if scanned.get(path) is None:
+                entries.extend(album_entries(path, files.get(path)))
+            else:
+                entries.extend(scanned[path])
+
+        terms = self.token_index()
+
+        if not isinstance(terms, MooDelta):
+            terms = MooDelta(terms, self.base)
+
+        terms = terms.change(stale, entries)
+
+        index = dict(self.index)
+        index['length'] = len(terms.results)
+        index['results'] = terms.results
+
+        if terms.changes() > self.changes:
+            self.save(index)
+        else:
+            self.index = index
+            self.token_index()
+
+    def build_index(self, albdex, catalog=None, workers=None, files=None):
+        '''
+        returns search index results for index of albums and dict of
+        album signatures, extracting only albums added or changed
+        since the last build (as signed in catalog) and reusing the
+        current entries of the rest
+        '''
+        files = files or dict()
+        known = catalog.searched() if catalog and self.index else dict()
+        sigs = dict()
 
-            if isinstance(entry[2], str) and terms in entry[2].lower():
-                art[entry[2]] = entry
+        for path in albdex:
+            try:
+                sigs[path] = album_signature(path, files.get(path))
+            except FileNotFoundError:
+                logging.warning('Album not found: %s', path)
 
-            if isinstance(entry[3], str) and terms in entry[3].lower():
-                trk.append(entry)
+        fresh = [x for x in sigs if known.get(x) != sigs[x]]
+        entries = {x: list() for x in sigs}
 
-        return alb, art, trk
+        if len(fresh) < len(sigs):
+            skip = set(fresh)
+
+            for entry in self.index.get('results') or ():
+                if entry[0] not in skip and entry[0] in entries:
+                    entries[entry[0]].append(entry)
+
+        for entry in MooSearch.search_index(fresh, workers=workers,
+                                            files=files):
+            entries[entry[0]].append(entry)
+
+        logging.info('Moodex extracted %d/%d albums', len(fresh), len(sigs))
+
+        return [x for path in sigs for x in entries[path]], sigs
+
+    def load_index(self):
+        '''
+        returns search index mapped from SINDEX, or imported from
+        SINDEX_JSON (and written to SINDEX) if only that exists
+        '''
+        data = sindex.read(self.indexfile)
+
+        if data is None and self.jsonfile:
+            data = MooSearch.load_search(self.jsonfile)
+
+            if data:
+                self.save(data)
+                data = self.index
+
+        return data
+
+    def save(self, data, export=False):
+        '''
+        write search index data to SINDEX (and SINDEX_JSON if export)
+        and use it mapped from file (or in memory if not written),
+        returns True if written
+        '''
+        self.index = data
+
+        try:
+            sindex.write(self.indexfile, data)
+
+            if export and self.jsonfile:
+                MooSearch.export_search(self.jsonfile, data)
+
+            self.index = sindex.read(self.indexfile) or data
+        except OSError as err:
+            logging.warning('Cannot write search index: %s', err)
+            return False
+        finally:
+            self.token_index()
+
+        return True
+
+    @staticmethod
+    def export_search(fpath, data):
+        '''
+        write search index to (JSON) file
+        '''
+        data = dict(data)
+        data['results'] = list(data.get('results') or ())
+
+        with open(fpath, 'w') as _:
+            _.write(json.dumps(data))
+            logging.info('Wrote %d bytes to %s', _.tell(), fpath)
 
     @staticmethod
     def load_search(fpath):
         '''
-        returns search index from file
+        returns search index from (JSON) file
         '''
         if os.path.exists(fpath):
             with open(fpath) as _:
@@ -66,44 +277,24 @@ class MooSearch:
         return None
 
     @staticmethod
-    def search_index(albdex, limit=None):
+    def search_index(albdex, limit=None, workers=None, files=None):
         '''
-        returns full search index from index of albums
+        returns full search index from index of albums, extracted by
+        a pool of workers (default: one per CPU), reusing the lists of
+        album files from the last scan if given
         '''
         count = 0
         out = list()
 
         logging.info('> Moodex %s', len(albdex))
 
-        for path in albdex:  # random.sample(albdex, 250):
-
-            for ind, track in enumerate(sorted(albums.tracks(path))):
-                audio = mutagen.File(str(track))
-
-                if not audio:
-                    continue
-
-                album = get(audio.tags, ['ALBUM', 'album', 'TALB', '©alb'])
-                artist = get(audio.tags, ['ARTIST', 'artist', 'TPE1', '©ART'])
-                title = get(audio.tags, ['TITLE', 'title', 'TIT2', '©nam'])
-                tnum = get(audio.tags, ['TRCK', 'track', 'trkn'])
-
-                if not title:
-                    fname, _ = os.path.splitext(Path(track).name)
-                    title = fname
-
-                try:
-                    ind = int(tnum) - 1
-                except (TypeError, ValueError):
-                    pass
-
-                tmp = [path, album, artist, title, ind + 1]
-
-                out.append(tmp)
+        for _, _, _, entries, _ in albums.scan(
+                albdex, files, True, workers, covers=False):
+            out.extend(entries)
 
             if count and count % 100 == 0:
                 logging.info('Moodex %d/%d', count, len(albdex))
-                logging.info('[%d] %s', count, tmp)
+                logging.info('[%d] %s', count, out[-1] if out else None)
 
             count += 1
 
@@ -113,22 +304,45 @@ class MooSearch:
         return out
 
 
-def get(tags, labels):
-    '''return value for label from tags'''
-    for lbl in labels:
+def album_entries(path, files=None):
+    '''
+    returns list of search index entries for tracks in album path, or
+    in its sorted list of files if given
+    '''
+    return albums.album_scan(path, files, True, False)[2]
+
 
-        try:
-            val = tags.get(lbl)
-        except ValueError:
-            pass
+def best(scores, score, key):
+    '''
+    returns dict of scores by track id of the track id with the best
+    score (first if tied) in each group of track ids in scores by key
+    '''
+    out = dict()
+    seen = dict()
 
-        if val:
-            if hasattr(val, 'text'):
-                val = val.text
+    for tid in scores:
+        value = score(tid)
+        group = key(tid)
+        last = seen.get(group)
 
-            if isinstance(val, list):
-                val = val[0]
+        if last is None or (-value, tid) < (-out[last], last):
+            if last is not None:
+                del out[last]
+            seen[group] = tid
+            out[tid] = value
+
+    return out
+
+
+def top(scores, offset=0, limit=None):
+    '''
+    returns list of track ids (keys of scores) from offset to limit,
+    ranked by score (then track id), sorting only as many as needed
+    '''
+    def rank(tid):
+        return (-scores[tid], tid)
 
-            return val
+    if limit is None:
+        return sorted(scores, key=rank)[offset:]
 
-    return None
+    return heapq.nsmallest(offset + limit, scores, key=rank)[offset:]
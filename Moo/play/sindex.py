@@ -0,0 +1,381 @@
+'''
+MooIndex class, a memory-mapped binary search index
+
+file layout (header fields little-endian, sections in the byte order
+recorded in the header, each starting on an 8-byte boundary):
+
+    header      MAGIC, VERSION, byte order, tracks, strings, seconds,
+                then (offset, length) of each of SECTIONS
+    offsets     Q * (strings + 1), string data offsets by string id
+    strings     UTF-8 string data (paths, tags, tokens, and trigrams)
+    tracks      i * 5 * tracks, (path, album, artist, title) string
+                ids (-1 if None) and track number by track id
+    tokens<N>   I * tokens, string ids of sorted tokens in field N
+    ranges<N>   Q * (tokens + 1), postings offsets by token in field N
+    names<N>    I * names, first track ids with each distinct value of
+                field N (ignoring case), sorted by value in lower case
+    grams<N>    I * grams, string ids of sorted trigrams of the tokens
+                in field N (see terms.grams)
+    granges<N>  Q * (grams + 1), gpostings offsets by trigram in field N
+    postings    I * postings, sorted track ids by token
+    gpostings   I * gpostings, sorted positions in tokens<N> by trigram
+'''
+
+import logging
+import mmap
+import os
+import struct
+import sys
+
+from array import array
+from bisect import bisect_left
+
+from Moo.play.terms import FIELDS, MooTerms, grams, names, tokens
+
+
+MAGIC = b'MOOSIDX\x00'
+
+VERSION = 3
+
+SECTIONS = ('offsets', 'strings', 'tracks',
+            'tokens1', 'ranges1', 'tokens2', 'ranges2', 'tokens3', 'ranges3',
+            'postings', 'names1', 'names2', 'names3',
+            'grams1', 'granges1', 'grams2', 'granges2', 'grams3', 'granges3',
+            'gpostings')
+
+HEADER = struct.Struct('<8sHcxIII' + 'QQ' * len(SECTIONS))
+
+PREFIX = struct.Struct('<8sHc')  # magic, version, byte order
+
+ORDER = b'<' if sys.byteorder == 'little' else b'>'
+
+
+class MooIndex(MooTerms):
+
+    '''
+    returns an instance of MooIndex, a search index file mapped into
+    memory, queried like MooTerms without reading it all (only pages
+    touched by lookups are loaded)
+    '''
+
+    def __init__(self, fpath):
+        with open(fpath, 'rb') as _:
+            self.mmap = mmap.mmap(_.fileno(), 0, access=mmap.ACCESS_READ)
+
+        view = memoryview(self.mmap)
+
+        if len(view) < PREFIX.size or view[:len(MAGIC)] != MAGIC:
+            raise ValueError('Not a search index: %s' % fpath)
+
+        _, version, order = PREFIX.unpack_from(view)
+
+        if version != VERSION or order != ORDER:
+            raise ValueError('Unsupported search index version %d (%s), '
+                             'build search again: %s'
+                             % (version, order.decode(), fpath))
+
+        if len(view) < HEADER.size:
+            raise ValueError('Search index too short: %s' % fpath)
+
+        header = HEADER.unpack_from(view)
+        length, seconds = header[3], header[5]
+        spans = header[6:]
+        sections = dict()
+
+        for ind, name in enumerate(SECTIONS):
+            offset, size = spans[2 * ind], spans[2 * ind + 1]
+            sections[name] = view[offset:offset + size]
+
+        self.fpath = fpath
+        self.length = length
+        self.seconds = seconds
+        self.offsets = sections['offsets'].cast('Q')
+        self.strings = sections['strings']
+        self.tracks = sections['tracks'].cast('i')
+        self.postings = sections['postings'].cast('I')
+        self.gpostings = sections['gpostings'].cast('I')
+        self.granges = dict()
+        self.grams = dict()
+        self.named = dict()
+        self.ranges = dict()
+        self.tokens = dict()
+
+        for field in FIELDS:
+            tids = sections['names%d' % field].cast('I')
+            self.named[field] = (MooNames(self, field, tids), tids)
+            self.ranges[field] = sections['ranges%d' % field].cast('Q')
+            self.granges[field] = sections['granges%d' % field].cast('Q')
+            self.grams[field] = MooStrings(
+                self, sections['grams%d' % field].cast('I'))
+            self.tokens[field] = MooStrings(
+                self, sections['tokens%d' % field].cast('I'))
+
+        self.results = MooResults(self)
+
+    def expand(self, field, token):
+        '''
+        returns set of track ids with a token in field starting with
+        token
+        '''
+        known = self.tokens[field]
+        ranges = self.ranges[field]
+        out = set()
+        ind = bisect_left(known, token)
+
+        while ind < len(known) and known[ind].startswith(token):
+            out.update(self.postings[ranges[ind]:ranges[ind + 1]])
+            ind += 1
+
+        return out
+
+    def exact(self, field, token):
+        '''
+        returns track ids with token in field
+        '''
+        known = self.tokens[field]
+        ranges = self.ranges[field]
+        ind = bisect_left(known, token)
+
+        if ind < len(known) and known[ind] == token:
+            return self.postings[ranges[ind]:ranges[ind + 1]]
+
+        return ()
+
+    def gram_tokens(self, field, gram):
+        '''
+        returns positions in tokens of field with trigram gram
+        '''
+        known = self.grams[field]
+        ranges = self.granges[field]
+        ind = bisect_left(known, gram)
+
+        if ind < len(known) and known[ind] == gram:
+            return self.gpostings[ranges[ind]:ranges[ind + 1]]
+
+        return ()
+
+    def key(self, tid, col):
+        '''
+        returns a key equal for track ids with the same value at col of
+        their search index entries (the string id, without reading it)
+        '''
+        return self.tracks[5 * tid + col]
+
+    def string(self, sid):
+        '''
+        returns string by string id, or None if sid is negative
+        '''
+        if sid < 0:
+            return None
+
+        return str(self.strings[self.offsets[sid]:self.offsets[sid + 1]],
+                   'utf-8', 'surrogatepass')
+
+    def track(self, tid):
+        '''
+        returns search index entry [path, album, artist, title, track
+        number] by track id
+        '''
+        row = self.tracks[5 * tid:5 * tid + 5]
+
+        return [self.string(row[0]), self.string(row[1]),
+                self.string(row[2]), self.string(row[3]), row[4]]
+
+    def data(self):
+        '''
+        returns search index dict (as loaded from JSON) with lazy
+        results
+        '''
+        return {
+            'length': self.length,
+            'output': self.fpath,
+            'seconds': self.seconds,
+            'results': self.results}
+
+
+class MooNames:
+
+    '''
+    sequence of field values (in lower case) by track ids in a
+    MooIndex, read on access
+    '''
+
+    def __init__(self, index, field, tids):
+        self.field = field
+        self.index = index
+        self.tids = tids
+
+    def __getitem__(self, ind):
+        sid = self.index.key(self.tids[ind], self.field)
+
+        return self.index.string(sid).lower()
+
+    def __len__(self):
+        return len(self.tids)
+
+
+class MooResults:
+
+    '''
+    sequence of search index entries in a MooIndex, read on access
+    '''
+
+    def __init__(self, index):
+        self.terms = index
+
+    def __getitem__(self, tid):
+        if tid < 0:
+            tid += len(self)
+
+        if not 0 <= tid < len(self):
+            raise IndexError('track id out of range')
+
+        return self.terms.track(tid)
+
+    def __iter__(self):
+        for tid in range(len(self)):
+            yield self.terms.track(tid)
+
+    def __len__(self):
+        return self.terms.length
+
+
+class MooStrings:
+
+    '''
+    sequence of strings by string ids in a MooIndex, read on access
+    '''
+
+    def __init__(self, index, ids):
+        self.ids = ids
+        self.index = index
+
+    def __getitem__(self, ind):
+        return self.index.string(self.ids[ind])
+
+    def __len__(self):
+        return len(self.ids)
+
+
+def read(fpath):
+    '''
+    returns search index dict from binary search index file (mapped
+    into memory), or None if missing or unreadable
+    '''
+    if not os.path.exists(fpath):
+        return None
+
+    try:
+        index = MooIndex(fpath)
+    except (OSError, ValueError) as err:
+        logging.warning('Cannot read search index: %s', err)
+        return None
+
+    logging.info('Mapped search index: %s (%d tracks)', fpath, index.length)
+
+    return index.data()
+
+
+def write(fpath, data):
+    '''
+    write search index dict (length, seconds, and results) to binary
+    search index file, replacing it when complete
+    '''
+    ids = dict()
+    strings = list()
+
+    def intern(value):
+        if not isinstance(value, str):
+            return -1
+
+        if value not in ids:
+            ids[value] = len(strings)
+            strings.append(value.encode('utf-8', 'surrogatepass'))
+
+        return ids[value]
+
+    postings = {x: dict() for x in FIELDS}
+    tracks = array('i')
+
+    for tid, entry in enumerate(data['results']):
+        tracks.extend(intern(entry[x]) for x in range(4))
+        tracks.append(int(entry[4]))
+
+        for field in FIELDS:
+            value = entry[field]
+
+            if not isinstance(value, str):
+                continue
+
+            for token in set(tokens(value)):
+                postings[field].setdefault(token, array('I')).append(tid)
+
+    sections = dict()
+    flat = array('I')
+    gflat = array('I')
+
+    for field in FIELDS:
+        known = sorted(postings[field])
+        ranges = array('Q', [len(flat)])
+        found = dict()
+
+        for ind, token in enumerate(known):
+            intern(token)
+            flat.extend(postings[field][token])
+            ranges.append(len(flat))
+
+            for gram in grams(token):
+                found.setdefault(gram, array('I')).append(ind)
+
+        sections['tokens%d' % field] = array('I', (ids[x] for x in known))
+        sections['ranges%d' % field] = ranges
+
+        known = sorted(found)
+        ranges = array('Q', [len(gflat)])
+
+        for gram in known:
+            intern(gram)
+            gflat.extend(found[gram])
+            ranges.append(len(gflat))
+
+        sections['grams%d' % field] = array('I', (ids[x] for x in known))
+        sections['granges%d' % field] = ranges
+        sections['names%d' % field] = array(
+            'I', names(data['results'], field)[1])
+
+    offsets = array('Q', [0])
+
+    for item in strings:
+        offsets.append(offsets[-1] + len(item))
+
+    sections['offsets'] = offsets
+    sections['strings'] = b''.join(strings)
+    sections['tracks'] = tracks
+    sections['postings'] = flat
+    sections['gpostings'] = gflat
+
+    spans = list()
+    offset = HEADER.size
+
+    for name in SECTIONS:
+        offset += -offset % 8
+        size = len(memoryview(sections[name]).cast('B'))
+        spans.extend((offset, size))
+        offset += size
+
+    header = HEADER.pack(MAGIC, VERSION, ORDER, len(tracks) // 5,
+                         len(strings), int(data.get('seconds') or 0),
+                         *spans)
+
+    tmp = fpath + '.tmp'
+
+    with open(tmp, 'wb') as _:
+        _.write(header)
+
+        for name in SECTIONS:
+            _.write(b'\x00' * (-_.tell() % 8))
+            _.write(sections[name])
+
+        logging.info('Wrote %d bytes to %s', _.tell(), fpath)
+
+    os.replace(tmp, fpath)
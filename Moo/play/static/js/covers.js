@@ -0,0 +1,86 @@
+/** Moo covers (infinite scroll) **/
+
+var covers = document.getElementById("covers")
+var coversMore = document.getElementById("covers-more")
+var coversLoading = false
+var coversObserver = null
+
+
+function coverCard(card) {
+    let div = document.createElement("div")
+    div.className = "album-card"
+
+    let img = document.createElement("img")
+    img.decoding = "sync"
+    img.loading = "lazy"
+    img.src = "/img/" + card.href + "?size=256"
+    img.srcset = "/img/" + card.href + "?size=512 2x"
+
+    let link = document.createElement("a")
+    link.href = "/album/" + card.href
+    link.appendChild(img)
+
+    let title = document.createElement("b")
+    title.textContent = card.album
+
+    let album = document.createElement("div")
+    album.className = "clr-c"
+    album.appendChild(title)
+
+    let artist = document.createElement("div")
+    artist.style.whiteSpace = "nowrap"
+    artist.appendChild(coverLink("/artist/", card.artist))
+
+    let info = document.createElement("div")
+    info.appendChild(coverLink("/year/", card.year))
+    info.appendChild(document.createTextNode(" · "))
+    info.appendChild(coverLink("/genre/", card.genre))
+
+    div.appendChild(document.createElement("div")).appendChild(link)
+    div.appendChild(album)
+    div.appendChild(artist)
+    div.appendChild(info)
+
+    return div
+}
+
+
+function coverLink(prefix, text) {
+    let link = document.createElement("a")
+    link.href = prefix + text
+    link.textContent = text
+    return link
+}
+
+
+function loadCovers() {
+    let next = covers.getAttribute("next")
+
+    if (coversLoading || !next || !window.fetch) { return }
+
+    coversLoading = true
+
+    fetch(location.pathname + "?offset=" + next
+          + "&limit=" + covers.getAttribute("limit"))
+        .then(response => response.json())
+        .then(data => {
+            for (let card of data.albums) {
+                covers.insertBefore(coverCard(card), coversMore)
+            }
+            covers.setAttribute("next", data.next === null ? "" : data.next)
+            coversLoading = false
+
+            // observe again, to load more if still in view
+            coversObserver.unobserve(coversMore)
+            coversObserver.observe(coversMore)
+        })
+        .catch(() => { coversLoading = false })
+}
+
+
+if (covers && coversMore && window.IntersectionObserver) {
+    coversObserver = new IntersectionObserver(entries => {
+        if (entries.some(x => x.isIntersecting)) { loadCovers() }
+    }, {rootMargin: "1000px"})
+    coversObserver.observe(coversMore)
+}
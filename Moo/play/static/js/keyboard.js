@@ -23,16 +23,6 @@ function gotoRandom() {
 }
 
 
-function gotoRandomAlbum() {
-    let ralbum = control.getAttribute("ralbum")
-    let slash = ""
-    if (ralbum[0] != "/") {
-        slash = "/"
-    }
-    location = "/album" + slash + ralbum
-}
-
-
 function gotoTrack(num) {
     let ntracks = parseInt(control.getAttribute('ntracks'))
     if (parseInt(num) <= ntracks) {
@@ -83,7 +73,8 @@ function playOrPause() {
 
 
 function playRandomTrack() {
-    gotoTrack(control.getAttribute("rtrack"))
+    let ntracks = parseInt(control.getAttribute('ntracks'))
+    gotoTrack(Math.floor(Math.random() * ntracks) + 1)
 }
 
 
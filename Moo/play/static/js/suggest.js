@@ -0,0 +1,44 @@
+/** Moo search suggestions (as you type) **/
+
+var suggestInput = document.getElementById("search-input")
+var suggestList = document.getElementById("search-suggest")
+var suggestTimer = null
+var suggestQuery = ""
+
+
+function loadSuggest() {
+    let query = suggestInput.value.trim()
+
+    if (!query || query == suggestQuery || !window.fetch) { return }
+
+    suggestQuery = query
+
+    fetch("/suggest?q=" + encodeURIComponent(query))
+        .then(response => response.json())
+        .then(data => {
+            if (data.q != suggestQuery) { return }  // typed since
+
+            let values = new Set()
+
+            for (let item of data.artists) { values.add(item.artist) }
+            for (let item of data.albums) { values.add(item.album) }
+            for (let item of data.tracks) { values.add(item.title) }
+
+            suggestList.replaceChildren()
+
+            for (let value of values) {
+                let option = document.createElement("option")
+                option.value = value
+                suggestList.appendChild(option)
+            }
+        })
+        .catch(() => {})
+}
+
+
+if (suggestInput && suggestList) {
+    suggestInput.addEventListener("input", () => {
+        clearTimeout(suggestTimer)
+        suggestTimer = setTimeout(loadSuggest, 150)
+    })
+}
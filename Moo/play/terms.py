@@ -0,0 +1,297 @@
+'''
+MooTerms class
+'''
+
+import re
+
+from array import array
+from bisect import bisect_left
+
+
+FIELDS = (1, 2, 3)  # album, artist, title in search index entries
+
+FUZZY = ((8, 2), (4, 1))  # edits allowed for tokens at least this long
+
+FUZZY_CANDIDATES = 100  # most tokens checked by edit distance per token
+
+TOKEN = re.compile(r'\w+')
+
+
+class MooTerms:
+
+    '''
+    returns an instance of MooTerms, an inverted index of normalized
+    tokens to (compact, sorted) posting lists of track ids (positions
+    in results) for each of the album, artist, and title FIELDS of
+    search index results
+    '''
+
+    def __init__(self, results):
+        self.results = results
+        self.grams = dict()  # see gram_index()
+        self.named = dict()  # see names()
+        self.postings = {x: dict() for x in FIELDS}
+        self.tokens = dict()
+
+        for tid, entry in enumerate(results):
+            for field in FIELDS:
+                value = entry[field]
+
+                if not isinstance(value, str):
+                    continue
+
+                postings = self.postings[field]
+
+                for token in set(tokens(value)):
+                    if token not in postings:
+                        postings[token] = array('I')
+                    postings[token].append(tid)
+
+        for field in FIELDS:
+            self.tokens[field] = sorted(self.postings[field])
+
+    def expand(self, field, token):
+        '''
+        returns set of track ids with a token in field starting with
+        token
+        '''
+        known = self.tokens[field]
+        postings = self.postings[field]
+        out = set()
+        ind = bisect_left(known, token)
+
+        while ind < len(known) and known[ind].startswith(token):
+            out.update(postings[known[ind]])
+            ind += 1
+
+        return out
+
+    def exact(self, field, token):
+        '''
+        returns track ids with token in field
+        '''
+        return self.postings[field].get(token, ())
+
+    def key(self, tid, col):
+        '''
+        returns a key equal for track ids with the same value at col of
+        their search index entries (without reading the entries where
+        possible)
+        '''
+        return self.results[tid][col]
+
+    def match(self, field, terms):
+        '''
+        returns sorted list of track ids where field has a token
+        starting with each token in terms (AND) and, for more than one
+        token, contains terms (phrase), ignoring case, spacing, and
+        punctuation
+        '''
+        return sorted(self.ranks(field, terms))
+
+    def gram_index(self, field):
+        '''
+        returns dict of (compact) lists of positions in tokens of field
+        by token trigram (see grams), built on first use
+        '''
+        if field not in self.grams:
+            index = dict()
+
+            for ind, token in enumerate(self.tokens[field]):
+                for gram in grams(token):
+                    if gram not in index:
+                        index[gram] = array('I')
+                    index[gram].append(ind)
+
+            self.grams[field] = index
+
+        return self.grams[field]
+
+    def gram_tokens(self, field, gram):
+        '''
+        returns positions in tokens of field with trigram gram
+        '''
+        return self.gram_index(field).get(gram, ())
+
+    def names(self, field):
+        '''
+        returns (keys, tids) tuple of the distinct values of field (in
+        lower case) in sorted order, and the first track id with each,
+        built on first use
+        '''
+        if field not in self.named:
+            self.named[field] = names(self.results, field)
+
+        return self.named[field]
+
+    def ranks(self, field, terms, fuzzy=False):
+        '''
+        returns dict of scores by track id matching terms in field (see
+        match), counting 3 for each token of terms found in field, 2
+        for each token only found as a prefix, and (if fuzzy, without
+        the phrase check) 1 for each token only found within a few
+        edits (see similar)
+        '''
+        query = tokens(terms)
+
+        if not query:
+            return dict()
+
+        found = None
+        levels = list()
+
+        for token in sorted(set(query), key=len, reverse=True):
+            tids = self.expand(field, token)
+            near = set()
+
+            if fuzzy:
+                for other in self.similar(field, token):
+                    near.update(self.exact(field, other))
+
+            matched = tids.union(near) if near else tids
+            found = matched if found is None else found.intersection(matched)
+
+            if not found:
+                return dict()
+
+            levels.append((set(self.exact(field, token)), tids))
+
+        if len(query) > 1 and not fuzzy:
+            phrase = ' '.join(query)  # ignoring spaces and punctuation
+            checked = dict()  # by key, values are shared by many tracks
+            keep = list()
+
+            for tid in found:
+                key = self.key(tid, field)
+
+                if key not in checked:
+                    value = ' '.join(tokens(self.results[tid][field]))
+                    checked[key] = phrase in value
+
+                if checked[key]:
+                    keep.append(tid)
+
+            found = keep
+
+        scores = dict.fromkeys(found, 0)
+
+        for exact, prefixed in levels:
+            for tid in scores:
+                if tid in exact:
+                    scores[tid] += 3
+                elif tid in prefixed:
+                    scores[tid] += 2
+                else:
+                    scores[tid] += 1
+
+        return scores
+
+    def similar(self, field, token):
+        '''
+        returns list of tokens in field (other than token) within a few
+        edits of token (see FUZZY), found among the tokens sharing the
+        most trigrams with it (up to FUZZY_CANDIDATES) and verified by
+        (bounded) edit distance
+        '''
+        limit = next((x[1] for x in FUZZY if len(token) >= x[0]), 0)
+
+        if not limit:
+            return list()
+
+        known = self.tokens[field]
+        query = grams(token)
+        shared = dict()
+
+        for gram in query:
+            for ind in self.gram_tokens(field, gram):
+                shared[ind] = shared.get(ind, 0) + 1
+
+        # each edit changes <= 3 trigrams, but share at least one
+        need = max(1, len(query) - 3 * limit)
+        ranked = sorted((-count, ind) for ind, count in shared.items()
+                        if count >= need)
+        out = list()
+
+        for _, ind in ranked[:FUZZY_CANDIDATES]:
+            other = known[ind]
+
+            if other != token and distance(token, other, limit) <= limit:
+                out.append(other)
+
+        return out
+
+    def suggest(self, field, prefix, limit=10):
+        '''
+        returns list of up to limit track ids with distinct values of
+        field starting with prefix (ignoring case), in value order
+        '''
+        keys, tids = self.names(field)
+        prefix = prefix.lower()
+        out = list()
+        ind = bisect_left(keys, prefix)
+
+        while (ind < len(keys) and len(out) < limit
+               and keys[ind].startswith(prefix)):
+            out.append(tids[ind])
+            ind += 1
+
+        return out
+
+
+def distance(one, two, limit):
+    '''
+    returns the edit (Levenshtein) distance between strings one and
+    two, or limit + 1 as soon as it must be more than limit
+    '''
+    if abs(len(one) - len(two)) > limit:
+        return limit + 1
+
+    row = list(range(len(two) + 1))
+
+    for i, char in enumerate(one, 1):
+        last = row
+        row = [i]
+
+        for j, other in enumerate(two, 1):
+            row.append(min(last[j] + 1,
+                           row[j - 1] + 1,
+                           last[j - 1] + (char != other)))
+
+        if min(row) > limit:
+            return limit + 1
+
+    return row[-1]
+
+
+def grams(token):
+    '''
+    returns set of trigrams of token, padded to mark its ends
+    '''
+    value = '$%s$' % token
+
+    return {value[i:i + 3] for i in range(len(value) - 2)}
+
+
+def names(results, field):
+    '''
+    returns (keys, tids) tuple of the distinct values of field (in
+    lower case) in results, sorted, and the first track id with each
+    '''
+    first = dict()
+
+    for tid, entry in enumerate(results):
+        value = entry[field]
+
+        if isinstance(value, str):
+            first.setdefault(value.lower(), tid)
+
+    keys = sorted(first)
+
+    return keys, [first[x] for x in keys]
+
+
+def tokens(value):
+    '''
+    returns list of normalized (lower case, word) tokens in value
+    '''
+    return TOKEN.findall(value.lower())
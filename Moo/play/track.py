@@ -0,0 +1,116 @@
+'''
+MooTrack class
+'''
+
+
+FIELDS = (
+    'APIC', '_dashes', '_key', '_words', 'album', 'album_artist', 'artist',
+    'atime', 'bitrate', 'bits_per_sample', 'channels', 'codec',
+    'codec_description', 'composer', 'conductor', 'date', 'disc',
+    'encoder_info', 'encoding', 'fpath', 'genre', 'length', 'mtime',
+    'sample_rate', 'size', 'src', 'title', 'track', 'type', 'uri', 'year',
+    # stream info of MP3 (mutagen.mp3.MPEGInfo)
+    'album_gain', 'bitrate_mode', 'encoder_settings', 'frame_offset',
+    'layer', 'mode', 'padding', 'protected', 'sketchy', 'track_gain',
+    'track_peak', 'version',
+    # stream info of FLAC (mutagen.flac.StreamInfo)
+    'code', 'max_blocksize', 'max_framesize', 'md5_signature',
+    'min_blocksize', 'min_framesize', 'total_samples',
+)
+
+SLOTTED = frozenset(FIELDS)
+
+
+class MooTrack:
+
+    '''
+    returns an instance of MooTrack, a compact track record with a
+    slot for each of the common FIELDS (and a small dict for any other
+    tags), that can be used like the dict of track data it replaces
+    '''
+
+    __slots__ = FIELDS + ('_extra',)
+
+    def __init__(self, data=None):
+        self._extra = None
+
+        if data:
+            self.update(data)
+
+    def __contains__(self, key):
+        try:
+            self[key]
+        except KeyError:
+            return False
+
+        return True
+
+    def __getitem__(self, key):
+        if key in SLOTTED:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+
+        if self._extra is None:
+            raise KeyError(key)
+
+        return self._extra[key]
+
+    def __iter__(self):
+        for key in FIELDS:
+            if hasattr(self, key):
+                yield key
+
+        if self._extra:
+            yield from self._extra
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return 'MooTrack({!r})'.format(dict(self.items()))
+
+    def __setitem__(self, key, value):
+        if key in SLOTTED:
+            setattr(self, key, value)
+            return
+
+        if self._extra is None:
+            self._extra = dict()
+
+        self._extra[key] = value
+
+    def get(self, key, default=None):
+        '''
+        returns value of key, or default
+        '''
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def items(self):
+        '''
+        returns list of (key, value) tuples
+        '''
+        return [(x, self[x]) for x in self]
+
+    def keys(self):
+        '''
+        returns list of keys
+        '''
+        return list(self)
+
+    def update(self, data):
+        '''
+        set keys from dict (or MooTrack) data
+        '''
+        for key in data.keys():
+            self[key] = data[key]
+
+    def values(self):
+        '''
+        returns list of values
+        '''
+        return [self[x] for x in self]
@@ -0,0 +1,292 @@
+'''
+MooWatcher class
+'''
+
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import select
+import struct
+import threading
+import time
+
+
+# inotify(7) event masks
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+MASK = (IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE
+        | IN_DELETE | IN_DELETE_SELF | IN_ONLYDIR)
+
+EVENT = struct.Struct('iIII')  # wd, mask, cookie, len
+
+
+class MooWatcher:
+
+    '''
+    returns an instance of MooWatcher, which keeps MooAlbums (and
+    MooSearch, and MooCovers of removed albums) up to date with changes
+    under BASE from a background thread, using inotify on Linux, or
+    else polling with rescan()
+    '''
+
+    def __init__(self, moo, search=None, delay=2.0, interval=60,
+                 covers=None):
+        self.moo = moo
+        self.search = search
+        self.covers = covers
+        self.delay = delay
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.mode = None
+        self.thread = None
+        self.updates = 0
+
+    def flush(self, dirty, gone):
+        '''
+        update albums (and search) from dirty and gone directories
+        '''
+        changed = [x for x in dirty if x not in gone and os.path.isdir(x)]
+        gone = gone.union(x for x in dirty if not os.path.isdir(x))
+
+        try:
+            try:
+                summary = self.moo.update(changed, gone,
+                                          entries=self.indexing())
+            except OSError as err:  # changed again while updating
+                logging.warning('MooWatcher update failed (%s), '
+                                'rescanning', err)
+                summary = self.moo.rescan(entries=self.indexing())
+
+            self.publish(summary)
+        except Exception:  # keep watching
+            logging.exception('MooWatcher update failed, continuing')
+
+    def indexing(self):
+        '''
+        returns True if albums updates should scan search entries too
+        (to update a search index)
+        '''
+        return bool(self.search and self.search.index)
+
+    def poll(self):
+        '''
+        rescan albums (and tracks, see MooAlbums.rescan) every interval
+        seconds
+        '''
+        self.mode = 'poll'
+
+        while True:
+            time.sleep(self.interval)
+            self.rescan(deep=True)
+
+    def publish(self, summary):
+        '''
+        update search (and remove covers of removed albums) from albums
+        update summary, if anything changed
+        '''
+        if not (summary['added'] or summary['modified']
+                or summary['removed']):
+            return
+
+        if self.search:
+            self.search.update(summary, self.moo.files)
+
+        if self.covers:
+            self.covers.remove(summary['removed'])
+
+        self.updates += 1
+
+        logging.info('MooWatcher update %d (+%d ~%d -%d)',
+                     self.updates,
+                     len(summary['added']),
+                     len(summary['modified']),
+                     len(summary['removed']))
+
+    def rescan(self, deep=False):
+        '''
+        rescan albums (see MooAlbums.rescan) and publish the summary
+        '''
+        try:
+            self.publish(self.moo.rescan(deep=deep,
+                                         entries=self.indexing()))
+        except Exception:  # keep watching
+            logging.exception('MooWatcher rescan failed, continuing')
+
+    def run(self):
+        '''
+        watch BASE with inotify, falling back to polling
+        '''
+        try:
+            try:
+                self.watch(Inotify())
+            except (AttributeError, OSError) as err:
+                logging.warning('MooWatcher inotify failed (%s), '
+                                'polling every %d seconds',
+                                err, self.interval)
+                self.poll()
+        finally:
+            self.mode = None  # not watching (see admin)
+
+    def start(self):
+        '''
+        start watching in a daemon thread, unless already started
+        '''
+        with self.lock:
+            if self.thread is not None:
+                return
+
+            self.thread = threading.Thread(
+                target=self.run, name='MooWatcher', daemon=True)
+            self.thread.start()
+
+    def watch(self, inotify):
+        '''
+        collect inotify events into dirty (and gone) directories and
+        flush them once no events arrive for delay seconds
+        '''
+        self.mode = 'inotify'
+
+        base = None
+        dirty = set()
+        gone = set()
+        first = None
+        paths = dict()  # path by watch descriptor
+        sync = True
+
+        while True:
+            if base != self.moo.base:
+                for wd in list(paths):
+                    inotify.remove(wd)
+                paths = dict()
+                base = self.moo.base
+                sync = True
+
+            if sync:
+                watched = set(paths.values())
+
+                for path in self.moo.dirs:
+                    if path not in watched:
+                        wd = inotify.add(path)
+                        if wd is not None:
+                            paths[wd] = path
+
+                logging.info('MooWatcher watching %d dirs', len(paths))
+                sync = False
+
+            timeout = self.delay if dirty or gone else None
+
+            if first and time.time() - first > self.delay * 10:
+                timeout = 0  # do not defer updates forever
+
+            if select.select([inotify.fd], [], [], timeout)[0]:
+                for wd, mask, name in inotify.read():
+                    if mask & IN_Q_OVERFLOW:
+                        self.rescan()
+                        sync = True
+                        continue
+
+                    if mask & IN_IGNORED:
+                        paths.pop(wd, None)
+                        continue
+
+                    path = paths.get(wd)
+
+                    if not path:
+                        continue
+
+                    first = first or time.time()
+                    target = os.path.join(path, name) if name else path
+
+                    if mask & IN_DELETE_SELF:
+                        gone.add(path)
+                    elif mask & IN_ISDIR and mask & IN_MOVED_FROM:
+                        gone.add(target)
+                        dirty.add(path)
+                        for key in [x for x in paths
+                                    if paths[x] == target
+                                    or paths[x].startswith(target + os.sep)]:
+                            inotify.remove(key)
+                            del paths[key]
+                    elif mask & IN_ISDIR and mask & IN_DELETE:
+                        gone.add(target)
+                        dirty.add(path)
+                    elif mask & IN_ISDIR:
+                        dirty.update([path, target])
+                    else:
+                        dirty.add(path)
+
+                if timeout != 0:
+                    continue
+
+            if dirty or gone:
+                self.flush(dirty, gone)
+                dirty = set()
+                gone = set()
+                first = None
+                sync = True
+
+
+class Inotify:
+
+    '''
+    minimal inotify(7) interface via ctypes
+    '''
+
+    def __init__(self):
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c'),
+                                use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_CLOEXEC)
+
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+
+    def add(self, path):
+        '''
+        returns watch descriptor for directory path, or None if the
+        directory no longer exists
+        '''
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), MASK)
+
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err in (errno.ENOENT, errno.ENOTDIR):
+                return None
+            raise OSError(err, os.strerror(err), path)
+
+        return wd
+
+    def read(self):
+        '''
+        returns list of (wd, mask, name) tuples of pending events
+        '''
+        data = os.read(self.fd, 65536)
+        out = list()
+        pos = 0
+
+        while pos < len(data):
+            wd, mask, _, length = EVENT.unpack_from(data, pos)
+            pos += EVENT.size
+            name = data[pos:pos + length].rstrip(b'\0')
+            pos += length
+            out.append((wd, mask, os.fsdecode(name)))
+
+        return out
+
+    def remove(self, wd):
+        '''
+        remove watch descriptor wd
+        '''
+        self.libc.inotify_rm_watch(self.fd, wd)
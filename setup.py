@@ -10,5 +10,8 @@ setup(
         'flask-executor',
         'mutagen',
     ],
+    extras_require={
+        'covers': ['Pillow'],
+    },
     version='0.4'
 )
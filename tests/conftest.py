@@ -0,0 +1,157 @@
+'''
+Moo test fixtures: small audio files written from scratch (MPEG frames,
+FLAC STREAMINFO, MP4 atoms) and tagged with mutagen or raw ID3 frames
+'''
+
+import os
+import struct
+
+import pytest
+
+from mutagen.flac import FLAC, Picture
+from mutagen.mp4 import MP4, MP4Cover
+
+
+JPEG = b'\xff\xd8\xff\xe0' + b'\x00' * 300000 + b'\xff\xd9'
+
+MPEG = b'\xff\xfb\x90\x64' + b'\x00' * 413  # one MPEG-1 layer III frame
+
+
+def atom(name, data):
+    '''
+    returns MP4 atom name with data
+    '''
+    return struct.pack('>I', 8 + len(data)) + name + data
+
+
+def id3(frames, major=4):
+    '''
+    returns ID3v2.<major> tag bytes of (frame ID, data) frames, as is
+    '''
+    def size(value):
+        if major == 3:
+            return struct.pack('>I', value)
+        return bytes((value >> x) & 0x7f for x in (21, 14, 7, 0))
+
+    body = b''.join(fid.encode('ascii') + size(len(data)) + b'\x00\x00'
+                    + data for fid, data in frames)
+    tsize = len(body) + 64  # padding
+    header = b'ID3' + bytes((major, 0, 0)) + bytes(
+        (tsize >> x) & 0x7f for x in (21, 14, 7, 0))
+
+    return header + body + b'\x00' * 64
+
+
+def text(value, encoding=3):
+    '''
+    returns ID3 text frame data of value (or list of values)
+    '''
+    if isinstance(value, str):
+        value = [value]
+
+    codec = ('latin-1', 'utf-16', 'utf-16-be', 'utf-8')[encoding]
+
+    return bytes((encoding,)) + '\x00'.join(value).encode(codec)
+
+
+def apic(data, mime='image/jpeg', desc='', encoding=0):
+    '''
+    returns ID3 APIC frame data for image data
+    '''
+    codec = ('latin-1', 'utf-16', 'utf-16-be', 'utf-8')[encoding]
+    end = b'\x00\x00' if encoding in (1, 2) else b'\x00'
+
+    return (bytes((encoding,)) + mime.encode('latin-1') + b'\x00\x03'
+            + desc.encode(codec) + end + data)
+
+
+class Tracks:
+
+    '''
+    writes tagged audio files under a directory
+    '''
+
+    def __init__(self, root):
+        self.root = str(root)
+
+    def path(self, name):
+        path = os.path.join(self.root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def mp3(self, name, frames, major=4):
+        '''
+        write MP3 with ID3v2.<major> tag of raw (frame ID, data) frames
+        '''
+        path = self.path(name)
+
+        with open(path, 'wb') as _:
+            _.write(id3(frames, major) + MPEG * 20)
+
+        return path
+
+    def flac(self, name, tags, picture=None):
+        '''
+        write FLAC with Vorbis comments tags (and picture data)
+        '''
+        path = self.path(name)
+        info = struct.pack('>HH', 4096, 4096) + b'\x00' * 6
+        info += ((44100 << 44) | (1 << 41) | (15 << 36)
+                 | 44100).to_bytes(8, 'big') + b'\x00' * 16
+
+        with open(path, 'wb') as _:
+            _.write(b'fLaC\x80' + len(info).to_bytes(3, 'big') + info)
+
+        audio = FLAC(path)
+        audio.update(tags)
+
+        if picture:
+            pic = Picture()
+            pic.type = 3
+            pic.mime = 'image/jpeg'
+            pic.desc = 'front'
+            pic.data = picture
+            audio.add_picture(pic)
+
+        audio.save()
+
+        return path
+
+    def mp4(self, name, tags, picture=None):
+        '''
+        write MP4 (audio only) with ilst tags (and covr picture data)
+        '''
+        path = self.path(name)
+        mdhd = atom(b'mdhd', b'\x00' * 12 + struct.pack('>II', 44100, 44100)
+                    + b'\x00' * 4)
+        hdlr = atom(b'hdlr', b'\x00' * 8 + b'soun' + b'\x00' * 13)
+        mp4a = (struct.pack('>I', 44) + b'mp4a' + b'\x00' * 6 + b'\x00\x01'
+                + b'\x00' * 8 + struct.pack('>HH', 2, 16) + b'\x00' * 4
+                + struct.pack('>I', 44100 << 16) + atom(b'free', b''))
+        stsd = atom(b'stsd', b'\x00' * 4 + struct.pack('>I', 1) + mp4a)
+        mdia = atom(b'mdia', mdhd + hdlr + atom(b'minf', atom(b'stbl', stsd)))
+        mvhd = atom(b'mvhd', b'\x00' * 12 + struct.pack('>II', 1000, 1000)
+                    + b'\x00' * 80)
+
+        with open(path, 'wb') as _:
+            _.write(atom(b'ftyp', b'M4A \x00\x00\x00\x00M4A mp42isom')
+                    + atom(b'moov', mvhd + atom(b'trak', mdia))
+                    + atom(b'mdat', b'\x00' * 100))
+
+        audio = MP4(path)
+        audio.update(tags)
+
+        if picture:
+            audio['covr'] = [MP4Cover(picture, MP4Cover.FORMAT_JPEG)]
+
+        audio.save()
+
+        return path
+
+
+@pytest.fixture
+def tracks(tmp_path):
+    '''
+    returns Tracks writing under a temporary directory
+    '''
+    return Tracks(tmp_path)
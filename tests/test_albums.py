@@ -0,0 +1,76 @@
+'''
+tests for Moo.play.albums, MooAlbums rescan summaries
+'''
+
+import os
+import shutil
+
+import pytest
+
+from mutagen.flac import FLAC
+
+from Moo.play.albums import MooAlbums
+
+
+def touch(path):
+    '''
+    move the mtime of path a second ahead (beyond timestamp granularity)
+    '''
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+
+@pytest.fixture
+def moo(tracks, tmp_path):
+    '''
+    returns MooAlbums of a library of two albums, with a catalog
+    '''
+    for name in ('Miles Davis/Kind of Blue', 'John Coltrane/Blue Train'):
+        tracks.flac('lib/%s/01.flac' % name, {'album': name.split('/')[1]})
+
+    return MooAlbums({'BASE': tracks.path('lib'),
+                      'CATALOG': str(tmp_path / 'catalog.db')})
+
+
+def test_rescan_unchanged(moo):
+    modified = moo.modified
+    summary = moo.rescan(deep=True)
+
+    assert (summary['added'], summary['modified'], summary['removed']) == (
+        [], [], [])
+    assert moo.modified == modified
+
+
+def test_rescan_added_modified_removed(moo, tracks):
+    kind, train = [tracks.path('lib/' + x) for x in (
+        'Miles Davis/Kind of Blue', 'John Coltrane/Blue Train')]
+
+    tracks.flac('lib/Miles Davis/Sketches of Spain/01.flac',
+                {'album': 'Sketches of Spain'})
+    tracks.flac('lib/Miles Davis/Kind of Blue/02.flac',
+                {'album': 'Kind of Blue'})
+    shutil.rmtree(train)
+
+    for path in (kind, os.path.dirname(kind), os.path.dirname(train)):
+        touch(path)
+
+    summary = moo.rescan()
+    spain = tracks.path('lib/Miles Davis/Sketches of Spain')
+
+    assert summary['added'] == [spain]
+    assert summary['modified'] == [kind]
+    assert summary['removed'] == [train]
+    assert sorted(moo.albums) == sorted(summary['added'] + [kind])
+
+
+def test_rescan_deep(moo, tracks):
+    kind = tracks.path('lib/Miles Davis/Kind of Blue')
+    fpath = os.path.join(kind, '01.flac')
+
+    audio = FLAC(fpath)
+    audio['album'] = 'Kind of Blue (Legacy Edition)'
+    audio.save()
+    touch(fpath)
+
+    assert moo.rescan()['modified'] == []  # directory unchanged
+    assert moo.rescan(deep=True)['modified'] == [kind]
@@ -0,0 +1,98 @@
+'''
+tests for Moo.play.app, served from a small library with the Flask test
+client
+'''
+
+import importlib
+
+import pytest
+
+from conftest import JPEG, Tracks
+
+
+@pytest.fixture(scope='module')
+def app(tmp_path_factory):
+    '''
+    returns Moo.play.app module serving a library of two albums, run in
+    a temporary directory (for BASE, CATALOG, COVERS...)
+    '''
+    root = tmp_path_factory.mktemp('app')
+    tracks = Tracks(root)
+
+    for num in (1, 2):
+        tracks.flac('lib/Miles Davis/Kind of Blue/0%d.flac' % num, {
+            'album': 'Kind of Blue', 'artist': 'Miles Davis',
+            'title': 'Track %d' % num, 'tracknumber': str(num)},
+            picture=JPEG)
+
+    tracks.flac('lib/John Coltrane/Blue Train/01.flac', {
+        'album': 'Blue Train', 'artist': 'John Coltrane',
+        'title': 'Blue Train', 'tracknumber': '1'})
+
+    with pytest.MonkeyPatch.context() as patch:
+        patch.chdir(root)
+
+        with open('BASE', 'w') as _:
+            _.write(tracks.path('lib'))
+
+        yield importlib.import_module('Moo.play.app')
+
+
+@pytest.fixture
+def client(app):
+    return app.app.test_client()
+
+
+def test_rescan_keeps_etag(client):
+    url = '/album/Miles Davis/Kind of Blue'
+    first = client.get(url)
+
+    assert first.status_code == 200 and first.headers['ETag']
+
+    summary = client.get('/rescan').json
+    assert not (summary['added'] or summary['modified']
+                or summary['removed'])
+
+    again = client.get(url, headers={'If-None-Match': first.headers['ETag']})
+
+    assert again.status_code == 304
+    assert again.headers['ETag'] == first.headers['ETag']
+
+
+@pytest.mark.parametrize('url', [
+    '/img/Miles Davis/Kind of Blue',
+    '/img/John Coltrane/Blue Train',
+    '/meta/Miles Davis/Kind of Blue',
+])
+def test_not_modified(client, url):
+    first = client.get(url)
+
+    assert first.status_code == 200 and first.headers['ETag']
+
+    again = client.get(url, headers={'If-None-Match': first.headers['ETag']})
+
+    assert again.status_code == 304 and not again.data
+    assert again.headers['ETag'] == first.headers['ETag']
+
+    since = client.get(url, headers={
+        'If-Modified-Since': first.headers['Last-Modified']})
+
+    assert since.status_code == 304
+
+
+def test_stream_range(client):
+    url = '/stream/Miles Davis/Kind of Blue/01.flac'
+    full = client.get(url)
+
+    assert full.status_code == 200
+    assert full.headers['Accept-Ranges'] == 'bytes'
+
+    part = client.get(url, headers={'Range': 'bytes=4-99'})
+
+    assert part.status_code == 206
+    assert part.data == full.data[4:100]
+    assert part.headers['Content-Range'] == 'bytes 4-99/%d' % len(full.data)
+
+    assert client.get(url, headers={
+        'If-None-Match': full.headers['ETag']}).status_code == 304
+    assert client.get(url[:-7] + '09.flac').status_code == 404
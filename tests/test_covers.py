@@ -0,0 +1,49 @@
+'''
+tests for Moo.play.covers, the cover images cache
+'''
+
+import os
+
+from conftest import JPEG
+from Moo.play.albums import MooAlbums
+from Moo.play.covers import MooCovers
+from Moo.play.watch import MooWatcher
+
+
+def cached(root):
+    return sorted(x for _, _, files in os.walk(root) for x in files)
+
+
+def test_location_not_copied(tracks, tmp_path):
+    tracks.flac('lib/A/Album/01.flac', {'album': 'Album'}, picture=JPEG)
+    moo = MooAlbums({'BASE': tracks.path('lib')})
+    covers = MooCovers({'COVERS': str(tmp_path / 'covers')})
+    album = tracks.path('lib/A/Album')
+
+    assert covers.extract(album, moo.cover(album))
+    assert [x[-4:] for x in cached(covers.root)] == ['.src']
+    assert covers.lookup(album, None, moo.cover(album)) is None
+
+    assert covers.extract(album)  # no location: a full size copy
+    assert covers.get(album)[0].endswith('-full.jpg')
+
+
+def test_removed_albums_evicted(tracks, tmp_path):
+    for name in ('A/One', 'B/Two'):
+        tracks.flac('lib/%s/01.flac' % name, {'album': name}, picture=JPEG)
+
+    moo = MooAlbums({'BASE': tracks.path('lib')})
+    covers = MooCovers({'COVERS': str(tmp_path / 'covers')})
+
+    for album in moo.albums:
+        assert covers.get(album)
+
+    assert len(cached(covers.root)) == 4
+
+    os.unlink(tracks.path('lib/A/One/01.flac'))
+    os.rmdir(tracks.path('lib/A/One'))
+    MooWatcher(moo, covers=covers).publish(moo.rescan())
+
+    assert len(cached(covers.root)) == 2
+    assert covers.get(tracks.path('lib/B/Two'))
+    covers.remove([tracks.path('lib/A/One')])  # not cached
@@ -0,0 +1,175 @@
+'''
+tests for Moo.play.reader, the header-only tag reader, against mutagen
+'''
+
+import io
+from pathlib import Path
+
+import pytest
+
+from conftest import JPEG, apic, text
+from Moo.play import albums, lib, reader
+
+
+class CountingIO(io.FileIO):
+
+    '''
+    FileIO counting the bytes read from the file
+    '''
+
+    count = 0
+
+    def readinto(self, buffer):
+        size = super().readinto(buffer)
+        CountingIO.count += size or 0
+        return size
+
+
+@pytest.fixture
+def counted(monkeypatch):
+    '''
+    returns CountingIO, counting the bytes reader reads from files
+    '''
+    def opener(fpath, mode='rb'):
+        return io.BufferedReader(CountingIO(fpath, mode))
+
+    CountingIO.count = 0
+    monkeypatch.setattr(reader, 'open', opener, raising=False)
+
+    return CountingIO
+
+
+def assert_parity(fpath):
+    '''
+    assert track tags read by reader are as read by mutagen
+    '''
+    assert reader.read(fpath) is not None  # not a fallback
+
+    fast = albums.track_tags(Path(fpath), 0)
+    slow = albums.track_data(Path(fpath), 0)
+
+    assert fast == {x: slow[x] for x in fast}
+
+
+@pytest.mark.parametrize('major', (3, 4))
+def test_mp3_parity(tracks, major):
+    fpath = tracks.mp3('a.mp3', [
+        ('TALB', text('Kind of Blue')),
+        ('TPE1', text('Miles Davis')),
+        ('TPE2', text(['Miles Davis', 'Others'])),
+        ('TIT2', text('So What', encoding=1)),
+        ('TRCK', text('1/5')),
+        ('TPOS', text('1/1')),
+        ('TCON', text('(8)(CR)Modal')),
+        ('TYER', text('1959')),
+        ('TDAT', text('1708')),
+        ('TIME', text('1230')),
+        ('TXXX', text('\x00bar')),
+        ('APIC', apic(JPEG)),
+    ], major)
+
+    assert_parity(fpath)
+    assert albums.track_tags(Path(fpath), 0)['genre'] == 'Jazz, Cover, Modal'
+
+
+@pytest.mark.parametrize('genre, expected', [
+    ('(17)', 'Rock'),
+    ('17', 'Rock'),
+    ('RX', 'Remix'),
+    ('((Not) a reference', '(Not) a reference'),
+    ('Acid Jazz', 'Acid Jazz'),
+])
+def test_mp3_genres(tracks, genre, expected):
+    fpath = tracks.mp3('a.mp3', [
+        ('TALB', text('Album')), ('TCON', text(genre)),
+        ('TDRC', text('1999/05/12'))])
+
+    assert_parity(fpath)
+    assert albums.track_tags(Path(fpath), 0)['genre'] == expected
+    assert albums.track_tags(Path(fpath), 0)['year'] == '1999-05-12'
+
+
+def test_flac_parity(tracks):
+    fpath = tracks.flac('a.flac', {
+        'album': 'Homogenic', 'ARTIST': 'Björk', 'title': 'Hunter',
+        'tracknumber': '1', 'discnumber': '1', 'date': '1997',
+        'genre': ['Electronic', 'Pop']}, picture=JPEG)
+
+    assert_parity(fpath)
+
+
+def test_mp4_parity(tracks):
+    fpath = tracks.mp4('a.m4a', {
+        '\xa9alb': 'Abbey Road', '\xa9ART': 'The Beatles',
+        'aART': 'The Beatles', '\xa9nam': 'Come Together',
+        '\xa9day': '1969', '\xa9gen': 'Rock', 'trkn': [(1, 17)],
+        'disk': [(1, 1)]}, picture=JPEG)
+
+    assert_parity(fpath)
+
+
+def test_mp3_seeks_past_pictures(tracks, counted):
+    fpath = tracks.mp3('a.mp3', [
+        ('TALB', text('Album')), ('APIC', apic(JPEG)),
+        ('PRIV', b'x\x00' + b'\x00' * 10000), ('TIT2', text('Title'))])
+
+    _, tags = reader.read(fpath)
+
+    assert tags['TALB'] == ['Album'] and tags['TIT2'] == ['Title']
+    assert tags['APIC'] is None
+    assert counted.count < 64 * 1024 < len(JPEG)
+
+
+def test_mp3_fallbacks(tracks):
+    unsync = tracks.mp3('a.mp3', [('TALB', text('Album'))])
+
+    with open(unsync, 'r+b') as _:
+        _.seek(5)
+        _.write(b'\x80')  # unsynchronisation
+
+    assert reader.read(unsync) is None
+    assert reader.read(tracks.mp3('b.mp3', [('TALB', text('A'))], 2)) is None
+
+
+def assert_picture(fpath, mime='image/jpeg'):
+    '''
+    assert the picture located by reader is the image data mutagen reads
+    '''
+    offset, length, mtype = reader.picture(fpath)
+
+    with open(fpath, 'rb') as _:
+        _.seek(offset)
+        data = _.read(length)
+
+    assert data == bytes(lib.apic_data(lib.track_apic(fpath))[0])
+    assert mtype == mime
+
+
+@pytest.mark.parametrize('encoding', (0, 1, 3))
+def test_mp3_picture(tracks, counted, encoding):
+    fpath = tracks.mp3('a.mp3', [
+        ('TALB', text('Album')), ('PRIV', b'x\x00' + b'\x00' * 10000),
+        ('APIC', apic(JPEG, 'image/png', 'Front ' * 40, encoding))])
+
+    reader.picture(fpath)
+    assert counted.count < 64 * 1024
+
+    assert_picture(fpath, 'image/png')
+
+
+def test_flac_picture(tracks, counted):
+    fpath = tracks.flac('a.flac', {'album': 'Album'}, picture=JPEG)
+
+    reader.picture(fpath)
+    assert counted.count < 64 * 1024
+
+    assert_picture(fpath)
+
+
+def test_mp4_picture(tracks):
+    assert_picture(tracks.mp4('a.m4a', {'\xa9alb': 'Album'}, picture=JPEG))
+
+
+def test_no_picture(tracks):
+    assert reader.picture(tracks.mp3('a.mp3', [('TALB', text('A'))])) is False
+    assert reader.picture(tracks.flac('a.flac', {'album': 'A'})) is False
@@ -0,0 +1,87 @@
+'''
+tests for Moo.play.search, MooSearch updated in memory (see MooDelta)
+'''
+
+import os
+
+import pytest
+
+from Moo.play import sindex
+from Moo.play.delta import MooDeltaResults
+from Moo.play.search import MooSearch
+
+
+RESULTS = [
+    ['/lib/Miles Davis/Kind of Blue', 'Kind of Blue', 'Miles Davis',
+     'So What', 1],
+    ['/lib/Miles Davis/Kind of Blue', 'Kind of Blue', 'Miles Davis',
+     'Blue in Green', 3],
+    ['/lib/John Coltrane/Blue Train', 'Blue Train', 'John Coltrane',
+     'Blue Train', 1],
+    ['/lib/John Coltrane/Giant Steps', 'Giant Steps', 'John Coltrane',
+     'Giant Steps', 1],
+]
+
+
+@pytest.fixture
+def search(tmp_path):
+    '''
+    returns MooSearch of RESULTS mapped from a search index file
+    '''
+    fpath = str(tmp_path / 'search.idx')
+    sindex.write(fpath, {'seconds': 1, 'results': RESULTS})
+
+    return MooSearch({'BASE': '/lib', 'SINDEX': fpath, 'SINDEX_DELTA': 10})
+
+
+def summary(added=(), modified=(), removed=(), entries=None):
+    return {'added': list(added), 'modified': list(modified),
+            'removed': list(removed), 'entries': entries or dict()}
+
+
+def test_update_in_memory(search):
+    mtime = os.stat(search.indexfile).st_mtime_ns
+    new = ['/lib/Miles Davis/Sketches of Spain', 'Sketches of Spain',
+           'Miles Davis', 'Saeta', 4]
+    changed = ['/lib/John Coltrane/Blue Train', 'Blue Train',
+               'John Coltrane', 'Moment\'s Notice', 2]
+
+    search.update(summary(
+        added=[new[0]], modified=[changed[0]],
+        removed=['/lib/John Coltrane/Giant Steps'],
+        entries={new[0]: [new], changed[0]: [changed]}))
+
+    assert os.stat(search.indexfile).st_mtime_ns == mtime  # not written
+    assert isinstance(search.index['results'], MooDeltaResults)
+    assert search.index['length'] == 4
+    assert sorted(x[3] for x in search.index['results']) == [
+        'Blue in Green', 'Moment\'s Notice', 'Saeta', 'So What']
+
+    albums, artists, tracks, totals = search.find('blue')
+    assert list(albums) == ['/Miles Davis/Kind of Blue',
+                            '/John Coltrane/Blue Train']
+    assert [x[3] for x in tracks] == ['Blue in Green']
+
+    assert search.find('giant')[3] == {'albums': 0, 'artists': 0,
+                                       'tracks': 0}
+    assert [x[3] for x in search.find('moment')[2]] == ['Moment\'s Notice']
+    assert [x[3] for x in search.find('saeta')[2]] == ['Saeta']
+
+    artists = search.find('miles')[1]
+    assert list(artists) == ['Miles Davis']  # one group across both
+
+    found = search.suggest('s')
+    assert [x[1] for x in found['albums']] == ['Sketches of Spain']
+    assert [x[3] for x in found['tracks']] == ['Saeta', 'So What']
+
+
+def test_update_writes_over_limit(search):
+    entries = {'/lib/New/%d' % x: [['/lib/New/%d' % x, 'New %d' % x,
+                                    'New', 'Song', 1]] for x in range(12)}
+
+    search.update(summary(added=list(entries), entries=entries))
+
+    assert not isinstance(search.index['results'], MooDeltaResults)
+    assert search.index['length'] == 16
+    assert sindex.read(search.indexfile)['length'] == 16
+    assert search.find('new')[3]['albums'] == 12
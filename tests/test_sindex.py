@@ -0,0 +1,61 @@
+'''
+tests for Moo.play.sindex, the binary search index file
+'''
+
+import struct
+
+import pytest
+
+from Moo.play import sindex
+
+
+RESULTS = [
+    ['/lib/Miles Davis/Kind of Blue', 'Kind of Blue', 'Miles Davis',
+     'So What', 1],
+    ['/lib/Björk/Homogenic', 'Homogenic', 'Björk', 'Jóga', 3],
+    ['/lib/Odd/\udcff', None, 'Odd', 'Tïtle \udcff', 0],
+]
+
+
+@pytest.fixture
+def fpath(tmp_path):
+    '''
+    returns path of a search index file of RESULTS
+    '''
+    fpath = str(tmp_path / 'search.idx')
+    sindex.write(fpath, {'seconds': 7, 'results': RESULTS})
+
+    return fpath
+
+
+def test_round_trip(fpath):
+    index = sindex.read(fpath)
+
+    assert index['length'] == len(RESULTS) and index['seconds'] == 7
+    assert list(index['results']) == RESULTS
+    assert index['results'][-1] == RESULTS[-1]
+
+    with pytest.raises(IndexError):
+        index['results'][len(RESULTS)]
+
+
+def test_version_rejected(fpath):
+    with open(fpath, 'r+b') as _:
+        _.seek(len(sindex.MAGIC))
+        _.write(struct.pack('<H', sindex.VERSION - 1))
+
+    with pytest.raises(ValueError, match='version'):
+        sindex.MooIndex(fpath)
+
+    assert sindex.read(fpath) is None
+
+
+def test_not_an_index(tmp_path):
+    fpath = tmp_path / 'search.idx'
+    fpath.write_bytes(b'{"results": []}')
+
+    with pytest.raises(ValueError, match='Not a search index'):
+        sindex.MooIndex(str(fpath))
+
+    assert sindex.read(str(fpath)) is None
+    assert sindex.read(str(tmp_path / 'missing.idx')) is None
@@ -0,0 +1,72 @@
+'''
+tests for Moo.play.terms, MooTerms queried in memory and mapped from a
+search index file (MooIndex)
+'''
+
+import pytest
+
+from Moo.play import sindex
+from Moo.play.terms import MooTerms
+
+
+RESULTS = [
+    ['/lib/Miles Davis/Kind of Blue', 'Kind of Blue', 'Miles Davis',
+     'So What', 1],
+    ['/lib/Miles Davis/Kind of Blue', 'Kind of Blue', 'Miles Davis',
+     'Blue in Green', 3],
+    ['/lib/John Coltrane/Blue Train', 'Blue Train', 'John Coltrane',
+     'Blue Train', 1],
+    ['/lib/John Coltrane/Blue Train', 'Blue Train', 'John Coltrane',
+     'Lazy Bird', 5],
+    ['/lib/Bluesbreakers/Bluesbreakers', 'Bluesbreakers',
+     'John Mayall', 'All Your Love', 1],
+    ['/lib/Misc/Untitled', None, 'Various', 'Green Dolphin Street', 2],
+]
+
+
+@pytest.fixture(params=['memory', 'mapped'])
+def terms(request, tmp_path):
+    '''
+    returns MooTerms of RESULTS, or MooIndex of them written to a file
+    '''
+    if request.param == 'memory':
+        return MooTerms(RESULTS)
+
+    fpath = str(tmp_path / 'search.idx')
+    sindex.write(fpath, {'seconds': 0, 'results': RESULTS})
+
+    return sindex.MooIndex(fpath)
+
+
+def test_ranks(terms):
+    assert terms.ranks(1, 'blue') == {0: 3, 1: 3, 2: 3, 3: 3, 4: 2}
+    assert terms.ranks(3, 'in gr') == {1: 5}  # exact and prefix
+    assert terms.ranks(2, 'john') == {2: 3, 3: 3, 4: 3}
+    assert terms.ranks(1, 'nothing') == {}
+    assert terms.ranks(1, '') == {}
+
+
+def test_match_phrase(terms):
+    assert terms.match(1, 'kind blue') == []  # not a phrase
+    assert terms.match(1, 'of blue') == [0, 1]
+    assert terms.match(3, 'GREEN, dolphin') == [5]
+
+
+def test_fuzzy(terms):
+    assert terms.ranks(2, 'coltrain') == {}
+    assert terms.ranks(2, 'coltrain', fuzzy=True) == {2: 1, 3: 1}
+    assert terms.ranks(2, 'milez', fuzzy=True) == {0: 1, 1: 1}
+    assert terms.ranks(2, 'miels', fuzzy=True) == {}  # two edits
+    assert terms.ranks(2, 'mls', fuzzy=True) == {}  # too short
+    assert terms.similar(3, 'dolphn') == ['dolphin']
+
+
+def test_suggest(terms):
+    values = [terms.results[x][1] for x in terms.suggest(1, 'BLUE')]
+    assert values == ['Blue Train', 'Bluesbreakers']
+
+    values = [terms.results[x][3] for x in terms.suggest(3, 'blue')]
+    assert values == ['Blue in Green', 'Blue Train']
+
+    assert len(terms.suggest(2, '', limit=2)) == 2
+    assert terms.suggest(1, 'x') == []